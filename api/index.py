@@ -1,13 +1,11 @@
 from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import create_engine, event, select, func, Column, Integer, String, Boolean, DateTime, ForeignKey
 from sqlalchemy.orm import declarative_base, sessionmaker, Session, relationship
 from pydantic import BaseModel, ConfigDict
 from typing import Optional, List
 from datetime import datetime
 import os
-import json
 from pathlib import Path
 
 # Database setup - Use environment variable or default to SQLite
@@ -27,6 +25,19 @@ try:
         connect_args=connect_args,
         pool_pre_ping=True  # Test connections before using them
     )
+    
+    if is_sqlite:
+        @event.listens_for(engine, "connect")
+        def _sqlite_on_connect(dbapi_connection, connection_record):
+            # WAL keeps reads going while a write commits; NORMAL syncs only at checkpoints
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')}")
+            cursor.execute(f"PRAGMA cache_size=-{os.getenv('SQLITE_CACHE_SIZE_KB', '65536')}")
+            cursor.execute(f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE_MB', '256')) * 1024 * 1024}")
+            cursor.close()
+    
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     Base = declarative_base()
 except Exception as e:
@@ -84,6 +95,16 @@ class Attachment(Base):
     
     note = relationship("Note", back_populates="attachments")
 
+class SchemaVersion(Base):
+    # Not backend/main.py's schema_version, which records migration steps, so a shared
+    # database never has one side reading the other's version numbers
+    __tablename__ = "api_schema_version"
+    
+    version = Column(Integer, primary_key=True)
+
+# Bump when the models change; a database already at this version skips create_all on cold start
+SCHEMA_VERSION = 1
+
 # Pydantic Schemas
 class NoteBase(BaseModel):
     content: str
@@ -141,68 +162,31 @@ class TaskResponse(TaskBase):
 _db_initialized = False
 
 # Initialize database and seed data
+def schema_is_current(db: Session) -> bool:
+    try:
+        return (db.scalar(select(func.max(SchemaVersion.version))) or 0) >= SCHEMA_VERSION
+    except Exception:
+        # No api_schema_version table yet
+        db.rollback()
+        return False
+
 def init_db():
-    """Create tables and seed initial data"""
+    """Create tables and seed initial data, unless the database is already set up"""
     global _db_initialized
     if _db_initialized:
         return
     
     try:
-        Base.metadata.create_all(bind=engine)
-        
         db = SessionLocal()
         try:
-            existing_users = db.query(User).count()
-            if existing_users == 0:
-                user_a = User(username="user_a", display_name="Hehe")
-                user_b = User(username="user_b", display_name="Haha")
-                db.add(user_a)
-                db.add(user_b)
-                db.commit()
-                
-                sample_tasks = [
-                    Task(
-                        title="Setup development environment",
-                        description="Install all necessary tools and dependencies",
-                        assigned_to=user_a.id,
-                        status="Completed",
-                        completed_at=datetime.utcnow()
-                    ),
-                    Task(
-                        title="Design database schema",
-                        description="Create ERD and define relationships",
-                        assigned_to=user_b.id,
-                        status="Completed",
-                        completed_at=datetime.utcnow()
-                    ),
-                    Task(
-                        title="Implement API endpoints",
-                        description="Build REST API with FastAPI",
-                        assigned_to=user_a.id,
-                        status="Pending"
-                    ),
-                    Task(
-                        title="Build React frontend",
-                        description="Create responsive UI with React and TailwindCSS",
-                        assigned_to=user_b.id,
-                        status="Pending"
-                    ),
-                ]
-                
-                for task in sample_tasks:
-                    db.add(task)
-                
+            if not schema_is_current(db):
+                Base.metadata.create_all(bind=engine)
+                if db.query(User).count() == 0:
+                    seed_db(db)
+                    print("✅ Database initialized with sample data")
+                db.query(SchemaVersion).delete()
+                db.add(SchemaVersion(version=SCHEMA_VERSION))
                 db.commit()
-                
-                task_1 = db.query(Task).first()
-                if task_1:
-                    note_1 = Note(task_id=task_1.id, content="Started with Python 3.11 installation")
-                    note_2 = Note(task_id=task_1.id, content="Configured virtual environment successfully")
-                    db.add(note_1)
-                    db.add(note_2)
-                    db.commit()
-                
-                print("✅ Database initialized with sample data")
             _db_initialized = True
         finally:
             db.close()
@@ -210,6 +194,49 @@ def init_db():
         print(f"⚠️ Database initialization warning: {e}")
         _db_initialized = True  # Mark as attempted to avoid retry loops
 
+def seed_db(db: Session):
+    """Add the sample users, tasks and notes; committed by the caller in one transaction"""
+    user_a = User(username="user_a", display_name="Hehe")
+    user_b = User(username="user_b", display_name="Haha")
+    db.add_all([user_a, user_b])
+    db.flush()
+    
+    task_1 = Task(
+        title="Setup development environment",
+        description="Install all necessary tools and dependencies",
+        assigned_to=user_a.id,
+        status="Completed",
+        completed_at=datetime.utcnow()
+    )
+    db.add_all([
+        task_1,
+        Task(
+            title="Design database schema",
+            description="Create ERD and define relationships",
+            assigned_to=user_b.id,
+            status="Completed",
+            completed_at=datetime.utcnow()
+        ),
+        Task(
+            title="Implement API endpoints",
+            description="Build REST API with FastAPI",
+            assigned_to=user_a.id,
+            status="Pending"
+        ),
+        Task(
+            title="Build React frontend",
+            description="Create responsive UI with React and TailwindCSS",
+            assigned_to=user_b.id,
+            status="Pending"
+        ),
+    ])
+    db.flush()
+    
+    db.add_all([
+        Note(task_id=task_1.id, content="Started with Python 3.11 installation"),
+        Note(task_id=task_1.id, content="Configured virtual environment successfully"),
+    ])
+
 # Create FastAPI app for Vercel
 # root_path tells FastAPI to strip /api prefix from incoming requests
 app = FastAPI(
@@ -483,6 +510,9 @@ async def upload_attachment(
 @app.get("/attachments/{attachment_id}/download")
 async def download_attachment(attachment_id: int, db: Session = Depends(get_db)):
     """Download an attachment"""
+    # Only downloads need it, so cold starts don't pay for importing it
+    from fastapi.responses import FileResponse
+    
     attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
     if not attachment:
         raise HTTPException(status_code=404, detail="Attachment not found")
@@ -0,0 +1,76 @@
+"""
+Cold-start budget for the Vercel function in api/index.py. Imports it in a fresh
+interpreter under `python -X importtime` against an already initialized database
+(a warm start) and fails if either budget is exceeded:
+
+  - the cumulative import time of the `index` module
+  - the number of SQL statements init_db() runs
+
+    python benchmarks/bench_api_startup.py [--max-import-ms 1500] [--max-statements 1] [--runs 3]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "api")
+
+# Run in the child interpreter: import index, then count init_db()'s statements
+CHILD = """
+import index
+from sqlalchemy import event
+statements = []
+event.listen(index.engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+index.init_db()
+print(len(statements))
+"""
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$")
+
+def start(database_url: str, importtime: bool = True):
+    """Import api/index.py in a fresh interpreter; returns (import microseconds, statement count)"""
+    flags = ["-X", "importtime"] if importtime else []
+    result = subprocess.run(
+        [sys.executable, *flags, "-c", CHILD],
+        cwd=API_DIR, env={**os.environ, "DATABASE_URL": database_url},
+        capture_output=True, text=True, check=True
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative[match.group(2)] = int(match.group(1))
+    return cumulative.get("index"), int(result.stdout.split()[-1])
+
+def run():
+    parser = argparse.ArgumentParser(description="Cold-start budget for api/index.py")
+    parser.add_argument("--max-import-ms", type=float, default=1500)
+    parser.add_argument("--max-statements", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=3, help="warm starts to measure; the fastest import counts")
+    args = parser.parse_args()
+    
+    database_url = f"sqlite:///{tempfile.mkdtemp(prefix='task-tracker-bench-')}/tasks.db"
+    _, first_statements = start(database_url, importtime=False)
+    print(f"first start (creates and seeds the database): {first_statements} statements")
+    
+    warm = [start(database_url) for _ in range(args.runs)]
+    import_ms = min(micros for micros, _ in warm) / 1000
+    statements = max(count for _, count in warm)
+    print(f"warm start: import index {import_ms:.0f}ms (budget {args.max_import_ms:.0f}ms), "
+          f"init_db {statements} statements (budget {args.max_statements})")
+    
+    failures = []
+    if import_ms > args.max_import_ms:
+        failures.append(f"import time {import_ms:.0f}ms is over the {args.max_import_ms:.0f}ms budget")
+    if statements > args.max_statements:
+        failures.append(f"init_db ran {statements} statements, over the budget of {args.max_statements}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ Within the startup budget")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,65 @@
+"""
+POST /tasks/bulk against the equivalent one-request-per-task calls: create, reassign,
+complete and delete a batch of tasks both ways and compare the wall time.
+
+    python benchmarks/bench_bulk.py [--tasks 200]
+"""
+import argparse
+import time
+
+from common import load_app
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def check(response, status: int = 200):
+    assert response.status_code == status, response.text
+    return response
+
+def per_request(client, count: int):
+    timings = {}
+    body = {"description": "bench_bulk.py", "assigned_to": 1, "assigned_by": 2}
+    headers = {"Prefer": "return=minimal"}
+    ids, timings["create"] = timed(lambda: [
+        check(client.post("/tasks", json={"title": f"Task {i}", **body}, headers=headers), 201).json()["id"]
+        for i in range(count)
+    ])
+    _, timings["update"] = timed(lambda: [check(client.put(f"/tasks/{i}", json={"assigned_to": 2}, headers=headers)) for i in ids])
+    _, timings["complete"] = timed(lambda: [check(client.post(f"/tasks/{i}/complete", headers=headers)) for i in ids])
+    _, timings["delete"] = timed(lambda: [check(client.delete(f"/tasks/{i}"), 204) for i in ids])
+    return timings
+
+def bulk(client, count: int):
+    def send(operations):
+        results = check(client.post("/tasks/bulk", json={"operations": operations})).json()["results"]
+        assert all(result["status"] < 300 for result in results), results
+        return [result["task_id"] for result in results]
+    
+    timings = {}
+    body = {"description": "bench_bulk.py", "assigned_to": 1, "assigned_by": 2}
+    ids, timings["create"] = timed(lambda: send([{"op": "create", "task": {"title": f"Task {i}", **body}} for i in range(count)]))
+    _, timings["update"] = timed(lambda: send([{"op": "update", "task_id": i, "changes": {"assigned_to": 2}} for i in ids]))
+    _, timings["complete"] = timed(lambda: send([{"op": "complete", "task_id": i} for i in ids]))
+    _, timings["delete"] = timed(lambda: send([{"op": "delete", "task_id": i} for i in ids]))
+    return timings
+
+def run():
+    parser = argparse.ArgumentParser(description="POST /tasks/bulk against one request per task")
+    parser.add_argument("--tasks", type=int, default=200, help="tasks per batch (the API takes up to MAX_BULK_OPERATIONS)")
+    args = parser.parse_args()
+    
+    main = load_app()
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as client:
+        single = per_request(client, args.tasks)
+        batched = bulk(client, args.tasks)
+    
+    print(f"{args.tasks} tasks per operation")
+    print(f"{'operation':10} {'per request':>12} {'bulk':>10} {'speedup':>8}")
+    for op in single:
+        print(f"{op:10} {single[op] * 1000:10.0f}ms {batched[op] * 1000:8.0f}ms {single[op] / batched[op]:7.1f}x")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,97 @@
+"""
+Concurrent throughput of a real uvicorn server. N clients page through GET /tasks
+while a probe times GET /health, which never touches the database: when queries
+block the event loop, /health latency climbs with N.
+
+Compare the async database layer with the synchronous one it replaced:
+
+    python benchmarks/bench_load.py                      # the working tree
+    python benchmarks/bench_load.py --ref 0728e81~1      # backend/main.py at a git ref
+
+Point --database-url at a Postgres server for numbers that reflect production;
+the default is a fresh SQLite file.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import free_port, start_server, wait_until_up
+
+async def seed(client: httpx.AsyncClient, tasks: int):
+    # One at a time, so the synchronous layer's SQLite writers never contend
+    for i in range(tasks):
+        response = await client.post("/tasks", json={
+            "title": f"Load test task {i}", "description": "Seeded by bench_load.py",
+            "assigned_to": 1 + i % 2, "assigned_by": 2 - i % 2
+        })
+        response.raise_for_status()
+
+def percentile(latencies: list, fraction: float) -> float:
+    latencies = sorted(latencies) or [0]
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000
+
+async def measure(client: httpx.AsyncClient, concurrency: int, duration: float, page_size: int):
+    stop = time.perf_counter() + duration
+    reads, errors, health = [], 0, []
+    
+    async def reader():
+        nonlocal errors
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                response = await client.get("/tasks", params={"limit": page_size})
+            except httpx.TimeoutException:
+                errors += 1
+                continue
+            if response.status_code == 200:
+                reads.append(time.perf_counter() - start)
+            else:
+                errors += 1
+    
+    async def probe():
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                await client.get("/health")
+            except httpx.TimeoutException:
+                pass
+            health.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+    
+    await asyncio.gather(probe(), *(reader() for _ in range(concurrency)))
+    print(
+        f"{concurrency:11} {len(reads) / duration:9.0f} {percentile(reads, 0.5):8.1f}ms {percentile(reads, 0.99):8.1f}ms "
+        f"{percentile(health, 0.5):10.1f}ms {percentile(health, 0.99):10.1f}ms {errors:7}"
+    )
+
+async def run_load(args):
+    port = free_port()
+    server = start_server(args.ref, args.database_url, port)
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 1)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=args.timeout) as client:
+            await wait_until_up(client)
+            await seed(client, args.tasks)
+            print(f"main.py from {args.ref or 'the working tree'}, GET /tasks?limit={args.page_size} for {args.duration:.0f}s per row")
+            print(f"{'concurrency':>11} {'req/s':>9} {'p50':>10} {'p99':>10} {'health p50':>12} {'health p99':>12} {'errors':>7}")
+            for concurrency in args.concurrency:
+                await measure(client, concurrency, args.duration, args.page_size)
+    finally:
+        server.terminate()
+        server.wait()
+
+def run():
+    parser = argparse.ArgumentParser(description="Concurrent throughput of a real uvicorn server")
+    parser.add_argument("--ref", help="git ref to take backend/main.py from (default: the working tree)")
+    parser.add_argument("--database-url", help="database to run against (default: a fresh SQLite file)")
+    parser.add_argument("--tasks", type=int, default=500, help="tasks to create before measuring")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--timeout", type=float, default=10, help="seconds before a request counts as an error")
+    asyncio.run(run_load(parser.parse_args()))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,84 @@
+"""
+GET /search against the naive ILIKE scan it replaces, over 100,000 notes on 10,000 tasks.
+Each query is timed as SQL both ways (first page of 20 hits) and end to end through /search.
+
+    python benchmarks/bench_search.py [--notes 100000]
+"""
+import argparse
+import random
+from datetime import datetime
+
+from sqlalchemy import literal, or_, union_all
+
+from common import best_of, load_app, seed_tasks
+
+WORDS = (
+    "budget report deploy review schema migrate invoice client meeting sprint backlog release "
+    "design mockup login payment refund ticket outage server latency cache index query export "
+    "import upload archive contract audit quarterly roadmap onboarding feedback survey"
+).split()
+
+QUERIES = [
+    ("common word", "budget"),
+    ("two words", "budget review"),
+    ("rare word", "zeppelin"),
+    ("prefix", "migr"),
+]
+
+def seed_notes(main, tasks: int, notes: int):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    rows = [
+        dict(
+            task_id=1 + rng.randrange(tasks),
+            content=" ".join(rng.choice(WORDS) for _ in range(12)) + (" zeppelin" if i % 5000 == 0 else ""),
+            created_at=now, updated_at=now
+        )
+        for i in range(notes)
+    ]
+    with main.engine.begin() as conn:
+        for start in range(0, notes, 10000):
+            conn.execute(main.insert(main.Note.__table__), rows[start:start + 10000])
+        main.rebuild_search_index(conn)
+
+def ilike_query(main, q: str, limit: int = 20):
+    """
+    The naive alternative: every word as a substring of a title, description or note,
+    newest first. Like ranking, the ordering needs every match, so the scan can't stop early.
+    """
+    Task, Note = main.Task, main.Note
+    words = q.split()
+    tasks = main.select(Task.id.label("task_id"), literal(None).label("note_id")).filter(
+        *(or_(Task.title.ilike(f"%{word}%"), Task.description.ilike(f"%{word}%")) for word in words)
+    )
+    notes = main.select(Note.task_id, Note.id).filter(*(Note.content.ilike(f"%{word}%") for word in words))
+    matches = union_all(tasks, notes).subquery()
+    return main.select(matches).order_by(matches.c.task_id.desc(), matches.c.note_id.desc()).limit(limit)
+
+def run():
+    parser = argparse.ArgumentParser(description="GET /search against an ILIKE scan")
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--notes", type=int, default=100000)
+    args = parser.parse_args()
+    
+    main = load_app()
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as client:
+        seed_tasks(main, args.tasks)
+        seed_notes(main, args.tasks, args.notes)
+        print(f"{args.tasks} tasks, {args.notes} notes")
+        print(f"{'query':26} {'hits':>5} {'ILIKE':>10} {'FTS':>10} {'speedup':>8} {'/search':>10}")
+        with main.engine.connect() as conn:
+            for label, q in QUERIES:
+                search_params = {"q": main.search_match(q), "limit": 21, "offset": 0}
+                hits = len(conn.execute(main.SEARCH_SQL, search_params).all())
+                ilike = best_of(lambda: conn.execute(ilike_query(main, q)).all())
+                fts = best_of(lambda: conn.execute(main.SEARCH_SQL, search_params).all())
+                endpoint = best_of(lambda: client.get("/search", params={"q": q}))
+                print(
+                    f"{label + ' (' + q + ')':26} {min(hits, 20):5} {ilike * 1000:8.1f}ms {fts * 1000:8.1f}ms "
+                    f"{ilike / fts:7.1f}x {endpoint * 1000:8.1f}ms"
+                )
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,41 @@
+"""
+Task list response times with JSON_SERIALIZER=pydantic and =orjson over 10,000 tasks.
+tests/test_serializer_golden.py checks that both produce the same bytes.
+
+    python benchmarks/bench_serializer.py [--tasks 10000]
+"""
+import argparse
+
+from common import best_of, load_app, seed_tasks
+
+URLS = [
+    "/tasks?expand=",
+    "/tasks",
+    "/tasks/my-view?user_id=1&compact=true&expand=",
+    "/tasks/my-view?user_id=1",
+]
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=10000)
+    args = parser.parse_args()
+    
+    main = load_app()
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as client:
+        seed_tasks(main, args.tasks)
+        print(f"{'URL':50} {'pydantic':>10} {'orjson':>10} {'speedup':>8} {'size':>8}")
+        for url in URLS:
+            timings = {}
+            for serializer, fast_json in (("pydantic", False), ("orjson", True)):
+                main.FAST_JSON = fast_json
+                client.get(url)
+                timings[serializer] = best_of(lambda: client.get(url))
+            size = len(client.get(url).content)
+            print(
+                f"{url:50} {timings['pydantic'] * 1000:8.0f}ms {timings['orjson'] * 1000:8.0f}ms "
+                f"{timings['pydantic'] / timings['orjson']:7.1f}x {size / 1e6:6.1f}MB"
+            )
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,106 @@
+"""
+SQLite under concurrent load: reads per second as readers are added with and without
+writers and uploads in flight. With WAL and a separate read pool, reads keep scaling
+while writes queue for the single writer; uploads are copied to disk before they queue,
+so they don't hold up other writes.
+
+    python benchmarks/bench_sqlite_concurrency.py [--duration 3]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import load_app, seed_tasks
+
+SCENARIOS = [  # (readers, writers, uploaders)
+    (1, 0, 0),
+    (4, 0, 0),
+    (16, 0, 0),
+    (1, 2, 0),
+    (4, 2, 0),
+    (16, 2, 0),
+    (4, 2, 4),
+]
+
+def percentile(latencies: list, fraction: float) -> float:
+    latencies = sorted(latencies) or [0]
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000
+
+async def measure(main, note_id: int, readers: int, writers: int, uploaders: int, duration: float):
+    stop = time.perf_counter() + duration
+    reads, writes, uploads, errors = [], 0, 0, 0
+    content = b"%PDF-1.4\n" + b"%" * (4 * 1024 * 1024)
+    
+    async def reader(client):
+        nonlocal errors
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            response = await client.get("/tasks", params={"limit": 50, "expand": ""})
+            if response.status_code == 200:
+                reads.append(time.perf_counter() - start)
+            else:
+                errors += 1
+    
+    async def writer(client, k):
+        nonlocal writes, errors
+        i = 0
+        while time.perf_counter() < stop:
+            i += 1
+            response = await client.post("/tasks", headers={"Prefer": "return=minimal"}, json={
+                "title": f"Writer {k} task {i}", "description": "bench_sqlite_concurrency.py", "assigned_to": 1
+            })
+            if response.status_code == 201:
+                writes += 1
+            else:
+                errors += 1
+    
+    async def uploader(client, k):
+        nonlocal uploads, errors
+        i = 0
+        while time.perf_counter() < stop:
+            i += 1
+            # Distinct content each time, so every upload stores a new blob
+            files = {"file": (f"upload-{k}-{i}.pdf", content + f"{k}-{i}".encode(), "application/pdf")}
+            response = await client.post(f"/notes/{note_id}/attachments", files=files)
+            if response.status_code == 200:
+                uploads += 1
+            else:
+                errors += 1
+    
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(
+            *(reader(client) for _ in range(readers)),
+            *(writer(client, k) for k in range(writers)),
+            *(uploader(client, k) for k in range(uploaders))
+        )
+    print(
+        f"{readers:7} {writers:7} {uploaders:9} {len(reads) / duration:8.0f} {percentile(reads, 0.5):8.1f}ms "
+        f"{percentile(reads, 0.99):8.1f}ms {writes / duration:9.0f} {uploads / duration:10.1f} {errors:7}"
+    )
+
+async def run_scenarios(main, args):
+    async with main.app.router.lifespan_context(main.app):
+        seed_tasks(main, args.tasks)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            task = await client.post("/tasks", json={"title": "Uploads", "description": "bench", "assigned_to": 1})
+            note = await client.post(f"/tasks/{task.json()['id']}/notes", json={"content": "Attachments"}, headers={"Prefer": "return=minimal"})
+            note_id = note.json()["id"]
+        print(f"{args.tasks} tasks, GET /tasks?limit=50 for {args.duration:.0f}s per row")
+        print(f"{'readers':>7} {'writers':>7} {'uploaders':>9} {'reads/s':>8} {'read p50':>10} {'read p99':>10} {'writes/s':>9} {'uploads/s':>10} {'errors':>7}")
+        for readers, writers, uploaders in SCENARIOS:
+            await measure(main, note_id, readers, writers, uploaders, args.duration)
+
+def run():
+    parser = argparse.ArgumentParser(description="SQLite reads, writes and uploads under concurrent load")
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=3)
+    args = parser.parse_args()
+    main = load_app()
+    asyncio.run(run_scenarios(main, args))
+
+if __name__ == "__main__":
+    run()
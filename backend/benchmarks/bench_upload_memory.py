@@ -0,0 +1,65 @@
+"""
+Peak server memory under parallel attachment uploads. Sends N uploads of just under
+10MB at once to a uvicorn server, then N oversized ones, and reports the growth of the
+server's peak RSS (VmHWM in /proc/<pid>/status, so Linux only). Streaming uploads keep
+it flat as N grows; reading each file into memory grows it by N x 10MB.
+
+    python benchmarks/bench_upload_memory.py                   # the working tree
+    python benchmarks/bench_upload_memory.py --ref 0341d6d~1   # before streaming uploads
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import free_port, start_server, wait_until_up
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmHWM not found")
+
+async def upload_burst(client: httpx.AsyncClient, server, note_id: int, uploads: int, size: int):
+    content = b"%PDF-1.4\n" + b"%" * (size - 9)
+    
+    async def upload(i):
+        files = {"file": (f"upload-{i}.pdf", content, "application/pdf")}
+        return (await client.post(f"/notes/{note_id}/attachments", files=files)).status_code
+    
+    before = peak_rss_mb(server.pid)
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(upload(i) for i in range(uploads)))
+    elapsed = time.perf_counter() - start
+    statuses = ", ".join(f"{statuses.count(status)} x {status}" for status in sorted(set(statuses)))
+    print(f"{uploads:8} {size / 2 ** 20:7.1f}MB {elapsed:8.2f}s {peak_rss_mb(server.pid) - before:+12.0f}MB  {statuses}")
+
+async def run_uploads(args):
+    port = free_port()
+    server = start_server(args.ref, None, port)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            await wait_until_up(client)
+            task = await client.post("/tasks", json={"title": "Uploads", "description": "bench_upload_memory.py", "assigned_to": 1})
+            note = await client.post(f"/tasks/{task.json()['id']}/notes", json={"content": "Attachments"})
+            # Answered with the whole task
+            note_id = max(n["id"] for n in note.json()["notes"])
+            print(f"main.py from {args.ref or 'the working tree'}, server peak RSS {peak_rss_mb(server.pid):.0f}MB after startup")
+            print(f"{'uploads':>8} {'size':>9} {'elapsed':>9} {'peak RSS growth':>13}  responses")
+            for uploads in args.uploads:
+                await upload_burst(client, server, note_id, uploads, 10 * 1024 * 1024 - 1024)
+            await upload_burst(client, server, note_id, max(args.uploads), 25 * 1024 * 1024)
+    finally:
+        server.terminate()
+        server.wait()
+
+def run():
+    parser = argparse.ArgumentParser(description="Peak server memory under parallel attachment uploads")
+    parser.add_argument("--ref", help="git ref to take backend/main.py from (default: the working tree)")
+    parser.add_argument("--uploads", type=int, nargs="+", default=[1, 4, 16], help="parallel uploads per burst")
+    asyncio.run(run_uploads(parser.parse_args()))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,103 @@
+"""
+Shared setup for the benchmarks: import main.py in-process against a throwaway
+SQLite database like the tests do, or serve it with uvicorn from a scratch directory.
+Run them from backend/: python benchmarks/<name>.py
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_app(**env):
+    """Import main.py configured by `env` (plus a fresh database and upload directory)"""
+    work_dir = tempfile.mkdtemp(prefix="task-tracker-bench-")
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{work_dir}/tasks.db",
+        "CACHE_BACKEND": "off",
+        "SLOW_REQUEST_MS": "0",
+        **env
+    })
+    os.chdir(work_dir)
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+    return main
+
+def seed_tasks(main, count: int, notes_per_task: int = 0):
+    """Insert `count` tasks (and notes) straight into the database, then rebuild what derives from them"""
+    now = datetime.utcnow()
+    with main.engine.begin() as conn:
+        first_id = (conn.scalar(main.select(main.func.max(main.Task.id))) or 0) + 1
+        conn.execute(main.insert(main.Task.__table__), [
+            dict(
+                title=f"Task {i}", description="Some description " * 3,
+                status="Completed" if i % 3 == 0 else "Pending",
+                assigned_to=1 + i % 2, assigned_by=2 - i % 2,
+                created_at=now, updated_at=now, last_activity_at=now,
+                note_count=notes_per_task, attachment_count=0
+            )
+            for i in range(count)
+        ])
+        if notes_per_task:
+            conn.execute(main.insert(main.Note.__table__), [
+                dict(task_id=first_id + i, content=f"Note {j} on task {i}", created_at=now, updated_at=now)
+                for i in range(count) for j in range(notes_per_task)
+            ])
+        main.rebuild_task_stats(conn)
+        main.rebuild_search_index(conn)
+
+def best_of(fn, repeat: int = 5) -> float:
+    """Fastest of `repeat` runs of fn(), in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(ref, database_url, port):
+    """Run uvicorn on main.py from the working tree, or from `ref`, in a scratch directory"""
+    work_dir = tempfile.mkdtemp(prefix="task-tracker-bench-")
+    app_dir = BACKEND_DIR
+    if ref:
+        app_dir = work_dir
+        source = subprocess.run(
+            ["git", "show", f"{ref}:backend/main.py"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        with open(os.path.join(work_dir, "main.py"), "w") as f:
+            f.write(source)
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url or f"sqlite:///{work_dir}/tasks.db",
+        "CACHE_BACKEND": "off",
+        "SLOW_REQUEST_MS": "0"
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", app_dir,
+         "--port", str(port), "--log-level", "warning"],
+        cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 30):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            if time.perf_counter() > deadline:
+                raise
+        await asyncio.sleep(0.1)
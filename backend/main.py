@@ -2,17 +2,49 @@
 Task Tracker API - FastAPI Backend
 A simple task management API for 2 users with notes support
 """
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Query, Request, Response
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, inspect, text
-from sqlalchemy.orm import declarative_base, sessionmaker, Session, relationship
-from pydantic import BaseModel, ConfigDict
-from typing import Optional, List
-from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.routing import Match
+from sqlalchemy import create_engine, event, select, insert, update, delete, func, Column, Integer, String, Boolean, DateTime, ForeignKey, Index, LargeBinary, inspect, text, tuple_, or_, null
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base, sessionmaker, relationship, selectinload, joinedload, load_only
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.schema import CreateIndex
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+from typing import Optional, List, Dict, Union, Literal, get_args
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+from collections import Counter, OrderedDict, deque
+from types import SimpleNamespace
 import os
-import shutil
+import sys
+import asyncio
+import contextlib
+import contextvars
+import json
+import base64
+import hashlib
+import math
+import re
+import tempfile
+import time
+import mimetypes
 from pathlib import Path
+from urllib.parse import urlencode
+
+try:
+    import orjson  # Optional: only needed for JSON_SERIALIZER=orjson
+except ImportError:
+    orjson = None
 
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tasks.db")
@@ -25,23 +57,237 @@ if DATABASE_URL.startswith("postgres://"):
 is_sqlite = "sqlite" in DATABASE_URL
 connect_args = {"check_same_thread": False} if is_sqlite else {}
 
+# SQLite tuning, applied to every connection (see _sqlite_on_connect)
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "4"))
+
+# Connection pools. Liveness: pre-ping costs a round trip on every checkout; with it off,
+# set DB_POOL_RECYCLE (seconds) below the server's idle timeout so stale connections are replaced first
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))  # -1: never
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+def async_database_url(url: str):
+    """
+    Map DATABASE_URL onto its async driver (aiosqlite for SQLite, asyncpg for Postgres).
+    Returns the URL and the connect args the async driver needs.
+    """
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite"), {}
+    
+    # asyncpg takes sslmode as its `ssl` connect argument rather than a URL parameter
+    sslmode = url.query.get("sslmode")
+    if sslmode:
+        return url.difference_update_query(["sslmode"]).set(drivername="postgresql+asyncpg"), {"ssl": sslmode}
+    return url.set(drivername="postgresql+asyncpg"), {}
+
+class PoolMetrics:
+    """Checkout wait, saturation and connection churn for one connection pool"""
+    WAIT_BUCKETS_MS = (1, 5, 25, 100, 500, 1000)
+    
+    def __init__(self, size: int, max_overflow: int):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.counters = Counter()
+        self.wait_buckets = Counter()
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.in_use = 0
+        self.peak_in_use = 0
+    
+    def record_wait(self, seconds: float):
+        self.counters["checkouts"] += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        bucket = next((f"<{limit}ms" for limit in self.WAIT_BUCKETS_MS if seconds * 1000 < limit), f">={self.WAIT_BUCKETS_MS[-1]}ms")
+        self.wait_buckets[bucket] += 1
+    
+    def attach(self, engine):
+        def checkout(*args):
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        
+        def checkin(*args):
+            self.in_use -= 1
+        
+        event.listen(engine, "checkout", checkout)
+        event.listen(engine, "checkin", checkin)
+        for name in ("connect", "close", "invalidate", "soft_invalidate"):
+            event.listen(engine, name, lambda *args, name=name: self.counters.update([f"{name}s"]))
+    
+    def snapshot(self, pool) -> dict:
+        checkouts = self.counters["checkouts"]
+        capacity = self.size + max(self.max_overflow, 0)
+        return {
+            "size": self.size,
+            "max_overflow": self.max_overflow,
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "peak_checked_out": self.peak_in_use,
+            "saturation": round(pool.checkedout() / capacity, 4) if capacity else None,
+            "checkouts": checkouts,
+            "timeouts": self.counters["timeouts"],
+            "wait_ms": {
+                "mean": round(self.wait_total / checkouts * 1000, 3) if checkouts else None,
+                "max": round(self.wait_max * 1000, 3),
+                "buckets": {bucket: self.wait_buckets[bucket] for bucket in self._bucket_names()}
+            },
+            # Churn: connections opened and closed (recycled, failed pre-ping or dropped) over the pool's life
+            "connections_opened": self.counters["connects"],
+            "connections_closed": self.counters["closes"],
+            "invalidations": self.counters["invalidates"] + self.counters["soft_invalidates"]
+        }
+    
+    def _bucket_names(self):
+        return [f"<{limit}ms" for limit in self.WAIT_BUCKETS_MS] + [f">={self.WAIT_BUCKETS_MS[-1]}ms"]
+
+class MeteredAsyncQueuePool(AsyncAdaptedQueuePool):
+    """The async engines' usual pool, timing every checkout (pre-ping included) into its PoolMetrics"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics(self.size(), self._max_overflow)
+    
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.metrics.counters["timeouts"] += 1
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+    
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+pool_args = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING
+}
+
 try:
     engine = create_engine(
         DATABASE_URL,
         connect_args=connect_args,
-        pool_pre_ping=True,  # Test connections before using them (important for cloud deployments)
-        echo=False
+        echo=False,
+        **pool_args
     )
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    # Request handlers use an async engine so queries don't block the event loop;
+    # the sync engine above is kept for startup, seeding and CLI commands
+    async_url, async_connect_args = async_database_url(DATABASE_URL)
+    # Set explicitly since aiosqlite would otherwise open a connection (and thread) per checkout
+    async_engine = create_async_engine(
+        async_url,
+        connect_args=async_connect_args,
+        poolclass=MeteredAsyncQueuePool,
+        echo=False,
+        **pool_args
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    
+    # On SQLite read-only endpoints get a pool of their own, so with WAL they never
+    # wait for a connection behind queued writers; elsewhere it's the same engine
+    async_read_engine = create_async_engine(
+        async_url,
+        connect_args=async_connect_args,
+        poolclass=MeteredAsyncQueuePool,
+        echo=False,
+        **{**pool_args, "pool_size": SQLITE_READ_POOL_SIZE}
+    ) if is_sqlite else async_engine
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
     Base = declarative_base()
 except Exception as e:
     print(f"⚠️ Database connection warning: {e}")
     raise
 
+def _sqlite_on_connect(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # SQLite only enforces foreign keys when asked to, per connection
+    cursor.execute("PRAGMA foreign_keys=ON")
+    # WAL lets readers carry on while a write commits; with WAL, synchronous=NORMAL
+    # only syncs at checkpoints and can lose (but not corrupt) the latest commits on power loss
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+    cursor.close()
+
+def _sqlite_read_only(dbapi_connection, connection_record):
+    # A write slipping into a read endpoint fails loudly instead of bypassing the writer queue
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+if is_sqlite:
+    event.listen(engine, "connect", _sqlite_on_connect)
+    event.listen(async_engine.sync_engine, "connect", _sqlite_on_connect)
+    event.listen(async_read_engine.sync_engine, "connect", _sqlite_on_connect)
+    event.listen(async_read_engine.sync_engine, "connect", _sqlite_read_only)
+
+# Request pools reported by /pool/stats; on Postgres reads and writes share one
+request_pools = {"write": async_engine} if async_read_engine is async_engine else {"write": async_engine, "read": async_read_engine}
+for pooled_engine in request_pools.values():
+    pooled_engine.pool.metrics.attach(pooled_engine.sync_engine)
+
+# Apply pending schema migrations at startup. Turn off when `python main.py migrate` runs
+# before the app starts, so startup does no DDL
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Tombstones older than this are pruned; sync tokens past it must resync from scratch
+TOMBSTONE_RETENTION = timedelta(days=int(os.getenv("TOMBSTONE_RETENTION_DAYS", "30")))
+
+# Change feed: "memory" for a single worker, "database" to share events between workers
+EVENT_BACKEND = os.getenv("EVENT_BACKEND", "memory")
+EVENT_BACKLOG = int(os.getenv("EVENT_BACKLOG", "1000"))
+EVENT_POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "0.5"))
+SSE_HEARTBEAT_SECONDS = 15
+
+# Response cache for GET endpoints: "memory" (per worker), "database" (shared between workers) or "off"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Requests slower than this are logged with the SQL they ran; 0 turns the log off
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+
+# Task list serializer: "pydantic" (default) or "orjson" to build list responses straight from rows
+JSON_SERIALIZER = os.getenv("JSON_SERIALIZER", "pydantic")
+FAST_JSON = JSON_SERIALIZER == "orjson" and orjson is not None
+if JSON_SERIALIZER == "orjson" and orjson is None:
+    print("⚠️ JSON_SERIALIZER=orjson but orjson is not installed; using pydantic")
+
+# Upper bound on operations accepted by one POST /tasks/bulk request
+MAX_BULK_OPERATIONS = int(os.getenv("MAX_BULK_OPERATIONS", "500"))
+
+# Keyset pagination defaults for task lists
+TASK_PAGE_SIZE = int(os.getenv("TASK_PAGE_SIZE", "50"))
+MAX_TASK_PAGE_SIZE = int(os.getenv("MAX_TASK_PAGE_SIZE", "500"))
+
 # Create uploads directory
 UPLOAD_DIR = "uploads"
 Path(UPLOAD_DIR).mkdir(exist_ok=True)
 
+# Content-addressed attachment blobs, sharded as blobs/ab/cd/abcd...
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 # Database Models
 class User(Base):
     __tablename__ = "users"
@@ -54,25 +300,40 @@ class Task(Base):
     __tablename__ = "tasks"
     
     id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True)
+    title = Column(String)
     description = Column(String)
     status = Column(String, default="Pending")  # Pending or Completed
     assigned_to = Column(Integer, ForeignKey("users.id"))
     assigned_by = Column(Integer, ForeignKey("users.id"), nullable=True)  # Who created/assigned the task
     created_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Denormalized for list views; kept current by the note/attachment endpoints (see repair_counters)
+    note_count = Column(Integer, nullable=False, default=0, server_default="0")
+    attachment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_activity_at = Column(DateTime, default=datetime.utcnow)  # Latest note or attachment change
     
     assigned_user = relationship("User", foreign_keys=[assigned_to], backref="assigned_tasks")
     assigner = relationship("User", foreign_keys=[assigned_by])
     notes = relationship("Note", back_populates="task", cascade="all, delete-orphan")
 
+# Indexes backing the task list filters and the (created_at, id) keyset ordering
+Index("ix_tasks_created_at_id", Task.created_at.desc(), Task.id.desc())
+Index("ix_tasks_status_created_at", Task.status, Task.created_at.desc(), Task.id.desc())
+Index("ix_tasks_assigned_to_status_created_at", Task.assigned_to, Task.status, Task.created_at.desc(), Task.id.desc())
+Index("ix_tasks_assigned_by_status_created_at", Task.assigned_by, Task.status, Task.created_at.desc(), Task.id.desc())
+# Per-user pages without a status filter (the default my-view and ?assigned_to= lists)
+Index("ix_tasks_assigned_to_created_at", Task.assigned_to, Task.created_at.desc(), Task.id.desc())
+Index("ix_tasks_assigned_by_created_at", Task.assigned_by, Task.created_at.desc(), Task.id.desc())
+
 class Note(Base):
     __tablename__ = "notes"
     
     id = Column(Integer, primary_key=True, index=True)
-    task_id = Column(Integer, ForeignKey("tasks.id"))
+    task_id = Column(Integer, ForeignKey("tasks.id"), index=True)
     content = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     task = relationship("Task", back_populates="notes")
     attachments = relationship("Attachment", back_populates="note", cascade="all, delete-orphan")
@@ -81,15 +342,83 @@ class Attachment(Base):
     __tablename__ = "attachments"
     
     id = Column(Integer, primary_key=True, index=True)
-    note_id = Column(Integer, ForeignKey("notes.id"))
+    note_id = Column(Integer, ForeignKey("notes.id"), index=True)
     filename = Column(String)
     file_path = Column(String)
     file_type = Column(String)  # pdf, image, etc.
     file_size = Column(Integer)
+    sha256 = Column(String, nullable=True, index=True)  # Content hash; NULL for files stored before the blob store
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     note = relationship("Note", back_populates="attachments")
 
+class Tombstone(Base):
+    """Record of a deleted task, note or attachment so /sync can report deletions"""
+    __tablename__ = "tombstones"
+    
+    id = Column(Integer, primary_key=True)
+    entity = Column(String)  # task, note or attachment; children go with their parent
+    entity_id = Column(Integer)
+    deleted_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class DataVersion(Base):
+    """Revision counter per data scope, bumped by every write; backs the list endpoint ETags"""
+    __tablename__ = "data_versions"
+    
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class ChangeEventRecord(Base):
+    """Change events shared between workers when EVENT_BACKEND=database"""
+    __tablename__ = "change_events"
+    
+    id = Column(Integer, primary_key=True)
+    payload = Column(String)  # JSON-encoded event
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class CachedResponseRecord(Base):
+    """Cached GET responses shared between workers when CACHE_BACKEND=database"""
+    __tablename__ = "response_cache"
+    
+    key = Column(String, primary_key=True)
+    generations = Column(String)  # JSON-encoded {tag: generation} the entry was computed under
+    headers = Column(String)  # JSON-encoded [name, value] pairs
+    body = Column(LargeBinary)
+    expires_at = Column(DateTime, index=True)
+
+class CacheTagRecord(Base):
+    """Invalidation generations for response cache tags when CACHE_BACKEND=database"""
+    __tablename__ = "response_cache_tags"
+    
+    tag = Column(String, primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+
+class SchemaVersion(Base):
+    """One row per applied migration (see MIGRATIONS)"""
+    __tablename__ = "schema_version"
+    
+    version = Column(Integer, primary_key=True)
+
+class TaskStat(Base):
+    """
+    Summary counters behind /stats, adjusted by every task write. user_id 0 with
+    direction "all" covers every task; otherwise direction is assigned_to or
+    assigned_by. metric is "status" (key: status), "completed_on" (key: UTC day)
+    or "duration" (key: log2 bucket of seconds from creation to completion).
+    """
+    __tablename__ = "task_stats"
+    
+    user_id = Column(Integer, primary_key=True)
+    direction = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+# "tasks" covers tasks, notes and attachments since TaskResponse embeds all three.
+# "blobs" backs no ETag; its row lock is the blob store's cross-worker mutex (see lock_blobs).
+DATA_VERSION_SCOPES = ("tasks", "users", "blobs")
+
 # Pydantic Schemas
 class NoteBase(BaseModel):
     content: str
@@ -112,50 +441,1542 @@ class NoteResponse(NoteBase):
     created_at: datetime
     attachments: List[AttachmentResponse] = []
 
-class UserResponse(BaseModel):
-    model_config = ConfigDict(from_attributes=True)
+class UserResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    username: str
+    display_name: str
+
+class TaskBase(BaseModel):
+    title: str
+    description: str
+    assigned_to: int
+
+class TaskCreate(TaskBase):
+    assigned_by: Optional[int] = None
+
+class TaskUpdate(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    assigned_to: Optional[int] = None
+    status: Optional[str] = None
+
+class TaskSummaryResponse(TaskBase):
+    """A task without its notes, for list views; the counters stand in for them"""
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    status: str
+    created_at: datetime
+    completed_at: Optional[datetime]
+    assigned_by: Optional[int] = None
+    assigned_user: UserResponse
+    assigner: Optional[UserResponse] = None
+    note_count: int = 0
+    attachment_count: int = 0
+    last_activity_at: Optional[datetime] = None
+
+class TaskResponse(TaskSummaryResponse):
+    notes: List[NoteResponse] = []
+
+class TaskRecord(TaskBase):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    status: str
+    created_at: datetime
+    completed_at: Optional[datetime]
+    assigned_by: Optional[int] = None
+    note_count: int = 0
+    attachment_count: int = 0
+    last_activity_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class NoteRecord(NoteBase):
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: int
+    task_id: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+class AttachmentRecord(AttachmentResponse):
+    updated_at: Optional[datetime] = None
+
+class TombstoneResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
+    entity: str
+    entity_id: int
+    deleted_at: datetime
+
+class SyncResponse(BaseModel):
+    tasks: List[TaskRecord]
+    notes: List[NoteRecord]
+    attachments: List[AttachmentRecord]
+    deleted: List[TombstoneResponse]
+    token: str
+
+class MyTasksViewResponse(BaseModel):
+    assigned_to_me: List[TaskResponse]
+    assigned_by_me: List[TaskResponse]
+    all_tasks: List[TaskResponse]
+    next_cursor: Optional[str] = None
+
+class MyTasksCompactResponse(BaseModel):
+    tasks: Dict[int, TaskResponse]
+    assigned_to_me: List[int]
+    assigned_by_me: List[int]
+    all_tasks: List[int]
+    next_cursor: Optional[str] = None
+
+class TaskStatsResponse(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    completed_per_day: Dict[str, int]  # Oldest first, zero-filled
+    median_completion_seconds: Optional[float]  # Estimated from power-of-two buckets
+
+class UserStatsResponse(BaseModel):
+    user_id: int
+    assigned_to: TaskStatsResponse
+    assigned_by: TaskStatsResponse
+
+class SearchHit(BaseModel):
+    kind: str  # "task" when the title/description matched, "note" for a note
+    task_id: int
+    note_id: Optional[int] = None
+    title: str  # Task title, with <mark> around matched terms when it matched
+    snippet: str  # Matching excerpt of the description or note, same markup
+    score: float
+
+class SearchResponse(BaseModel):
+    hits: List[SearchHit]
+    next_cursor: Optional[str] = None
+
+class BulkTaskOperation(BaseModel):
+    op: Literal["create", "update", "complete", "reopen", "delete"]
+    task_id: Optional[int] = None  # Required for everything but create
+    task: Optional[TaskCreate] = None  # Required for create
+    changes: Optional[TaskUpdate] = None  # Required for update
+
+class BulkTaskRequest(BaseModel):
+    operations: List[BulkTaskOperation]
+
+class BulkOperationResult(BaseModel):
+    index: int
+    op: str
+    status: int  # HTTP status the equivalent single request would have returned
+    task_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BulkTaskResponse(BaseModel):
+    results: List[BulkOperationResult]
+
+# Eager loading
+def _nested_schema(annotation):
+    """Return the Pydantic model wrapped by a field annotation (List[X], Optional[X]), if any."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        schema = _nested_schema(arg)
+        if schema is not None:
+            return schema
+    return None
+
+def _schema_columns(orm_model, schema):
+    mapper = inspect(orm_model)
+    return [getattr(orm_model, name) for name in schema.model_fields if name in mapper.column_attrs]
+
+def _build_load_options(orm_model, schema, parent=None, narrow=False):
+    options = []
+    relationships = inspect(orm_model).relationships
+    for name, field in schema.model_fields.items():
+        if name not in relationships:
+            continue
+        rel = relationships[name]
+        attr = getattr(orm_model, name)
+        # Collections get a separate IN query; many-to-one rows ride along in the main SELECT
+        if rel.uselist:
+            loader = parent.selectinload(attr) if parent is not None else selectinload(attr)
+        else:
+            loader = parent.joinedload(attr) if parent is not None else joinedload(attr)
+        options.append(loader)
+        nested = _nested_schema(field.annotation)
+        if nested is not None:
+            if narrow:
+                options.append(loader.load_only(*_schema_columns(rel.mapper.class_, nested)))
+            options.extend(_build_load_options(rel.mapper.class_, nested, loader, narrow))
+    return options
+
+@lru_cache(maxsize=None)
+def eager_options(orm_model, schema, narrow=False):
+    """
+    Loader options covering every relationship `schema` serializes from `orm_model`,
+    so a response costs a fixed number of queries regardless of row count.
+    With narrow=True related rows also load only the columns `schema` names.
+    """
+    return tuple(_build_load_options(orm_model, schema, narrow=narrow))
+
+# Loaded even when a projection leaves them out: keyset cursors, the my-view partitions and change events use them
+TASK_KEY_COLUMNS = (Task.created_at, Task.assigned_to, Task.assigned_by)
+
+def task_select(schema=TaskResponse):
+    """
+    Task SELECT with the relationships of `schema` loaded up front. Projections
+    (see task_schema) only serialize what they name, so their columns are narrowed too.
+    """
+    if schema is TaskResponse:
+        return select(Task).options(*eager_options(Task, schema))
+    columns = load_only(*_schema_columns(Task, schema), *TASK_KEY_COLUMNS)
+    return select(Task).options(columns, *eager_options(Task, schema, narrow=True))
+
+async def load_task(db: AsyncSession, task_id: int, schema=TaskResponse):
+    """Fetch a single task ready for serialization with `schema`"""
+    stmt = task_select(schema).filter(Task.id == task_id).execution_options(populate_existing=True)
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+# Single-statement task writes
+async def insert_task_row(db: AsyncSession, values: dict):
+    """INSERT a task and return its row; a bad user reference raises IntegrityError"""
+    stmt = insert(Task.__table__).values(**values)
+    if db.bind.dialect.insert_returning:
+        return (await db.execute(stmt.returning(*Task.__table__.c))).one()
+    task_id = (await db.execute(stmt)).inserted_primary_key[0]
+    return (await db.execute(select(*Task.__table__.c).filter(Task.id == task_id))).one()
+
+async def update_task_row(db: AsyncSession, task_id: int, values: dict):
+    """
+    UPDATE a task in place and return its row afterwards, or None if there is
+    no such task. Uses RETURNING where the dialect has it.
+    """
+    stmt = update(Task.__table__).filter(Task.id == task_id).values(**values)
+    if db.bind.dialect.update_returning:
+        return (await db.execute(stmt.returning(*Task.__table__.c))).first()
+    if (await db.execute(stmt)).rowcount == 0:
+        return None
+    return (await db.execute(select(*Task.__table__.c).filter(Task.id == task_id))).first()
+
+async def record_activity(db: AsyncSession, task_id: int, notes: int = 0, attachments: int = 0, at: Optional[datetime] = None):
+    """
+    Adjust a task's note/attachment counters and stamp last_activity_at in the
+    caller's transaction. Pass `at` when it should match the written row's own
+    timestamp. Returns the task row, or None if there is no such task.
+    """
+    values = {
+        "note_count": Task.note_count + notes,
+        "attachment_count": Task.attachment_count + attachments,
+        "last_activity_at": at or datetime.utcnow()
+    }
+    return await update_task_row(db, task_id, values)
+
+def repair_counters(conn) -> int:
+    """
+    Recompute the denormalized task counters from the notes and attachments
+    tables. last_activity_at only moves forward. Returns how many tasks were off.
+    """
+    note_count = select(func.count(Note.id)).filter(Note.task_id == Task.id).scalar_subquery()
+    attachment_count = (
+        select(func.count(Attachment.id)).join(Note, Attachment.note_id == Note.id)
+        .filter(Note.task_id == Task.id).scalar_subquery()
+    )
+    latest_note = select(func.max(Note.updated_at)).filter(Note.task_id == Task.id).scalar_subquery()
+    latest_attachment = (
+        select(func.max(Attachment.created_at)).join(Note, Attachment.note_id == Note.id)
+        .filter(Note.task_id == Task.id).scalar_subquery()
+    )
+    # SQLite's multi-argument max() is Postgres' greatest()
+    greatest = func.max if is_sqlite else func.greatest
+    last_activity = greatest(
+        func.coalesce(Task.last_activity_at, Task.created_at),
+        func.coalesce(latest_note, Task.created_at),
+        func.coalesce(latest_attachment, Task.created_at)
+    )
+    stale = or_(
+        Task.note_count != note_count,
+        Task.attachment_count != attachment_count,
+        Task.last_activity_at.is_(None),
+        Task.last_activity_at < last_activity
+    )
+    stmt = update(Task.__table__).where(stale).values(
+        note_count=note_count, attachment_count=attachment_count, last_activity_at=last_activity
+    )
+    return conn.execute(stmt).rowcount
+
+# Response shaping for writes
+def prefers_minimal(request: Request) -> bool:
+    """True when the client sent `Prefer: return=minimal` (RFC 7240)"""
+    preferences = (part.split(";")[0].strip().lower() for part in request.headers.get("prefer", "").split(","))
+    return "return=minimal" in preferences
+
+@lru_cache(maxsize=256)
+def _projection(schema, names: frozenset):
+    fields = {name: (info.annotation, info) for name, info in schema.model_fields.items() if name in names}
+    return create_model(f"{schema.__name__}Projection", __config__=ConfigDict(from_attributes=True), **fields)
+
+def select_fields(schema, fields: Optional[str]):
+    """
+    Narrow `schema` to a comma-separated `?fields=` list (id is always kept).
+    eager_options() on the result only loads the relationships that survive.
+    """
+    if not fields:
+        return schema
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - schema.model_fields.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return _projection(schema, frozenset(names | {"id"}))
+
+def response_schema(request: Request, fields: Optional[str], full_schema, minimal_schema):
+    """
+    Schema a write responds with: `minimal_schema` (the changed entity alone) under
+    Prefer: return=minimal, otherwise `full_schema`; either narrowed by `?fields=`.
+    Resolve it before writing so a bad field list fails the request, not the response.
+    """
+    return select_fields(minimal_schema if prefers_minimal(request) else full_schema, fields)
+
+TASK_EXPANSIONS = ("notes", "attachments")
+
+@lru_cache(maxsize=None)
+def _expanded_task_schema(expand: frozenset):
+    if "attachments" in expand:
+        return TaskResponse
+    if "notes" not in expand:
+        return TaskSummaryResponse
+    note_schema = _projection(NoteResponse, frozenset(NoteResponse.model_fields) - {"attachments"})
+    return create_model("TaskExpandedResponse", __base__=TaskSummaryResponse, notes=(List[note_schema], []))
+
+def task_schema(fields: Optional[str], expand: Optional[str]):
+    """
+    Output model for task reads. `?expand=` picks the collections to embed
+    (notes, attachments; attachments implies notes; all by default), then
+    `?fields=` picks top-level fields from what's left.
+    """
+    schema = TaskResponse
+    if expand is not None:
+        names = {name.strip() for name in expand.split(",") if name.strip()}
+        unknown = names - set(TASK_EXPANSIONS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown expansions: {', '.join(sorted(unknown))}")
+        schema = _expanded_task_schema(frozenset(names))
+    return select_fields(schema, fields)
+
+@lru_cache(maxsize=None)
+def my_view_schema(schema, compact: bool):
+    """MyTasksViewResponse / MyTasksCompactResponse carrying `schema` tasks"""
+    if compact:
+        return create_model(
+            "MyTasksCompactProjection", __base__=MyTasksCompactResponse, tasks=(Dict[int, schema], ...)
+        )
+    return create_model(
+        "MyTasksViewProjection",
+        __base__=MyTasksViewResponse,
+        assigned_to_me=(List[schema], ...),
+        assigned_by_me=(List[schema], ...),
+        all_tasks=(List[schema], ...)
+    )
+
+def has_relationships(schema) -> bool:
+    return any(_nested_schema(info.annotation) for info in schema.model_fields.values())
+
+@lru_cache(maxsize=None)
+def _adapter(schema):
+    return TypeAdapter(schema)
+
+def render(obj, schema, request: Request, status_code: int = 200, headers=None) -> Response:
+    """
+    Serialize `obj` with a schema picked at request time, bypassing the route's
+    response_model. Pass the injected Response's headers (ETag, cursors) along,
+    since FastAPI drops them once a Response is returned directly.
+    """
+    adapter = _adapter(schema)
+    with timed_serialization():
+        body = adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
+    headers = {key: value for key, value in (headers or {}).items() if key != "content-length"}
+    response = Response(body, status_code=status_code, headers=headers, media_type="application/json")
+    if prefers_minimal(request):
+        response.headers["Preference-Applied"] = "return=minimal"
+    return response
+
+async def task_response(db: AsyncSession, request: Request, row, schema, status_code: int = 200):
+    """Respond with a written task, loading only the relationships `schema` includes"""
+    if schema is TaskResponse:
+        return await load_task(db, row.id)
+    if has_relationships(schema):
+        row = await load_task(db, row.id, schema)
+    return render(row, schema, request, status_code)
+
+# Fast serialization
+# With JSON_SERIALIZER=orjson the task lists select plain column rows instead of ORM
+# objects and build the response dicts directly, in the field order of the same
+# schema, skipping Pydantic validation; ORJSONResponse encodes them.
+# Relationships are loaded with one IN query per relationship (and chunk).
+ROW_IN_CHUNK = 500
+
+@lru_cache(maxsize=None)
+def _row_columns(orm_model, schema):
+    """Columns to select for building `schema` from `orm_model` rows: its fields plus the keys its relationships join on"""
+    mapper = inspect(orm_model)
+    names = [column.key for column in mapper.primary_key]
+    names += [name for name in schema.model_fields if name in mapper.column_attrs]
+    for name in schema.model_fields:
+        if name in mapper.relationships:
+            names += [local.key for local, _ in mapper.relationships[name].local_remote_pairs]
+    return tuple(getattr(orm_model, name) for name in dict.fromkeys(names))
+
+def task_row_select(schema=TaskResponse):
+    """task_select() counterpart selecting rows for build_dicts()"""
+    columns = {column.key: column for column in (*_row_columns(Task, schema), *TASK_KEY_COLUMNS)}
+    return select(*columns.values())
+
+async def fetch_tasks(db: AsyncSession, stmt, rows: bool = False):
+    """Run a task_select() statement for ORM objects, or a task_row_select() one for rows"""
+    result = await db.execute(stmt)
+    return result.all() if rows else result.scalars().all()
+
+async def build_dicts(db: AsyncSession, orm_model, schema, rows) -> list:
+    """Shape `rows` of `orm_model` like `schema` would serialize them, loading nested rows as needed"""
+    if not rows:
+        return []
+    mapper = inspect(orm_model)
+    related = {}
+    for name, field in schema.model_fields.items():
+        if name not in mapper.relationships:
+            continue
+        rel = mapper.relationships[name]
+        nested = _nested_schema(field.annotation)
+        (local, remote), = rel.local_remote_pairs
+        child = rel.mapper.class_
+        remote_column = getattr(child, remote.key)
+        columns = {column.key: column for column in (*_row_columns(child, nested), remote_column)}
+        
+        keys = sorted({getattr(row, local.key) for row in rows} - {None})
+        child_rows = []
+        for start in range(0, len(keys), ROW_IN_CHUNK):
+            stmt = select(*columns.values()).filter(remote_column.in_(keys[start:start + ROW_IN_CHUNK]))
+            child_rows += (await db.execute(stmt.order_by(*rel.mapper.primary_key))).all()
+        
+        grouped = {}
+        for child_row, item in zip(child_rows, await build_dicts(db, child, nested, child_rows)):
+            key = getattr(child_row, remote.key)
+            if rel.uselist:
+                grouped.setdefault(key, []).append(item)
+            else:
+                grouped[key] = item
+        related[name] = (local.key, grouped, [] if rel.uselist else None)
+    
+    # Index into the row tuples rather than going through attribute access per field
+    position = {name: index for index, name in enumerate(rows[0]._fields)}
+    plan = [
+        (name, position[related[name][0]], *related[name][1:]) if name in related else (name, position[name], None, None)
+        for name in schema.model_fields
+    ]
+    return [
+        {name: row[index] if grouped is None else grouped.get(row[index], default) for name, index, grouped, default in plan}
+        for row in rows
+    ]
+
+def render_fast(payload, headers=None) -> Response:
+    """render() for payloads built by build_dicts()"""
+    headers = {key: value for key, value in (headers or {}).items() if key != "content-length"}
+    with timed_serialization():
+        return ORJSONResponse(payload, headers=headers)
+
+# Keyset pagination
+def encode_cursor(data) -> str:
+    """Pack pagination state into an opaque URL-safe token"""
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _parse_position(position):
+    try:
+        created_at, task_id = position
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def paginate_tasks(db: AsyncSession, stmt, limit: int, position=None, rows: bool = False):
+    """
+    Return one page of `stmt` ordered by (created_at, id) descending, plus the
+    position of its last row (None on the final page). Seeking past `position`
+    with a row comparison keeps deep pages as cheap as the first one.
+    `rows` is passed on to fetch_tasks().
+    """
+    if position is not None:
+        created_at, task_id = _parse_position(position)
+        stmt = stmt.filter(tuple_(Task.created_at, Task.id) < (created_at, task_id))
+    
+    stmt = stmt.order_by(Task.created_at.desc(), Task.id.desc()).limit(limit + 1)
+    tasks = await fetch_tasks(db, stmt, rows)
+    if len(tasks) <= limit:
+        return tasks, None
+    
+    page = tasks[:limit]
+    return page, [page[-1].created_at.isoformat(), page[-1].id]
+
+# Attachment storage
+def save_upload(source, max_size: int = MAX_UPLOAD_SIZE):
+    """
+    Stream an uploaded file object into a temp file inside UPLOAD_DIR in fixed-size
+    chunks, hashing as it goes and aborting as soon as `max_size` is exceeded.
+    Blocking; call through run_in_threadpool. Returns (temp_path, size, sha256 hex).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(status_code=413, detail="File size exceeds 10MB limit")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path, size, digest.hexdigest()
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], sha256)
+
+def store_blob(temp_path: str, sha256: str) -> str:
+    """Move a hashed upload into the blob store, dropping it if the content is already stored"""
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+    return path
+
+async def lock_blobs(db: AsyncSession):
+    """
+    Take the "blobs" version row lock until the caller's transaction ends. Uploads
+    reusing a blob and release_files() checking its references both hold it, in the
+    database rather than in-process, so one worker can't unlink a blob another just reused.
+    """
+    await bump_version(db, "blobs")
+
+async def release_files(db: AsyncSession, files):
+    """
+    Garbage-collect attachment files after their rows were deleted and committed.
+    `files` holds (sha256, file_path) pairs; a blob is only removed once no
+    Attachment row references its hash. Runs and commits its own transaction.
+    """
+    files = set(files)
+    if not files:
+        return
+    await lock_blobs(db)
+    try:
+        for sha256, file_path in files:
+            if sha256:
+                stmt = select(func.count()).select_from(Attachment).filter(Attachment.sha256 == sha256)
+                if await db.scalar(stmt):
+                    continue
+            try:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            except Exception as e:
+                print(f"Error deleting file: {e}")
+    finally:
+        await db.commit()
+
+# Attachment downloads
+# Blobs are content-addressed, so a given download URL always returns the same bytes
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+class AttachmentFileResponse(FileResponse):
+    """FileResponse whose If-Range check honours the validators we set rather than its own"""
+    def _should_use_range(self, http_if_range, stat_result):
+        return http_if_range in (self.headers.get("etag"), self.headers.get("last-modified"))
+
+def attachment_media_type(attachment) -> str:
+    if attachment.file_type == "pdf":
+        return "application/pdf"
+    guessed = mimetypes.guess_type(attachment.filename or "")[0]
+    return guessed if guessed and guessed.startswith("image/") else "application/octet-stream"
+
+def attachment_headers(attachment) -> dict:
+    """Validators and caching policy for an attachment download, computed without touching disk"""
+    if attachment.sha256:
+        etag = f'"{attachment.sha256}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        # Files stored before the blob store have no hash; they still never change in place
+        etag = f'"legacy-{attachment.id}-{attachment.file_size}"'
+        cache_control = "no-cache"
+    last_modified = attachment.created_at.replace(microsecond=0, tzinfo=timezone.utc)
+    return {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[str] = None) -> bool:
+    """Evaluate If-None-Match (weak comparison), falling back to If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+    
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+# Data versions and list ETags
+async def bump_version(db: AsyncSession, scope: str = "tasks"):
+    """
+    Advance a scope's revision inside the caller's transaction. Call it before the
+    ORM flush: the row lock it takes serializes writers until commit, so
+    updated_at/deleted_at stamps are assigned in commit order (which /sync relies on).
+    """
+    result = await db.execute(
+        update(DataVersion).filter(DataVersion.name == scope).values(version=DataVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(DataVersion(name=scope, version=1))
+
+async def check_not_modified(db: AsyncSession, request: Request, response: Response, scope: str = "tasks"):
+    """
+    Tag `response` with a weak ETag built from the scope's revision and the request URL.
+    Returns a 304 response when the client's copy is current, so callers can skip the
+    query and serialization entirely. The version is read before any data so a
+    concurrent write can only make the tag older than the body, never newer.
+    """
+    version = await db.scalar(select(DataVersion.version).filter(DataVersion.name == scope)) or 0
+    url_hash = hashlib.blake2b(str(request.url).encode(), digest_size=6).hexdigest()
+    etag = f'W/"{scope}-{version}-{url_hash}"'
+    
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return None
+
+# Incremental sync
+async def record_deletion(db: AsyncSession, entity: str, *entity_ids: int):
+    """Leave tombstones for /sync clients and prune ones past the retention window"""
+    db.add_all(Tombstone(entity=entity, entity_id=entity_id) for entity_id in entity_ids)
+    cutoff = datetime.utcnow() - TOMBSTONE_RETENTION
+    await db.execute(delete(Tombstone).filter(Tombstone.deleted_at < cutoff))
+
+def decode_sync_token(token: str) -> Optional[datetime]:
+    value = decode_cursor(token)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+# Task statistics
+# Everything the summary counters depend on; read before a write that can change them
+TASK_STATE_COLUMNS = (Task.id, Task.status, Task.assigned_to, Task.assigned_by, Task.created_at, Task.completed_at)
+
+def stat_contributions(task) -> Counter:
+    """The TaskStat keys a task in this state counts towards"""
+    targets = [(0, "all"), (task.assigned_to, "assigned_to"), (task.assigned_by, "assigned_by")]
+    targets = [(user_id, direction) for user_id, direction in targets if user_id is not None]
+    keys = Counter((user_id, direction, "status", task.status) for user_id, direction in targets)
+    if task.status == "Completed" and task.completed_at is not None:
+        seconds = max((task.completed_at - task.created_at).total_seconds(), 1) if task.created_at else 1
+        bucket = f"{int(math.log2(seconds)):02d}"
+        for user_id, direction in targets:
+            keys[(user_id, direction, "completed_on", task.completed_at.date().isoformat())] += 1
+            keys[(user_id, direction, "duration", bucket)] += 1
+    return keys
+
+def stats_delta(before=None, after=None) -> Counter:
+    """Counter changes for a task going from `before` to `after` (None when created/deleted)"""
+    delta = Counter()
+    if before is not None:
+        delta.subtract(stat_contributions(before))
+    if after is not None:
+        delta.update(stat_contributions(after))
+    return delta
+
+async def apply_stats(db: AsyncSession, delta: Counter):
+    """Apply a stats_delta in the caller's transaction as one upsert"""
+    rows = [
+        {"user_id": user_id, "direction": direction, "metric": metric, "key": key, "value": change}
+        for (user_id, direction, metric, key), change in delta.items() if change
+    ]
+    if not rows:
+        return
+    stmt = (sqlite if is_sqlite else postgresql).insert(TaskStat.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "direction", "metric", "key"],
+        set_={"value": TaskStat.__table__.c.value + stmt.excluded.value}
+    )
+    await db.execute(stmt, rows)
+
+async def task_state(db: AsyncSession, task_id: int):
+    return (await db.execute(select(*TASK_STATE_COLUMNS).filter(Task.id == task_id))).first()
+
+def rebuild_task_stats(db) -> int:
+    """Recompute task_stats from the tasks table; returns the number of tasks counted"""
+    db.execute(delete(TaskStat.__table__))
+    totals = Counter()
+    tasks = db.execute(select(*TASK_STATE_COLUMNS)).all()
+    for task in tasks:
+        totals.update(stat_contributions(task))
+    rows = [
+        {"user_id": user_id, "direction": direction, "metric": metric, "key": key, "value": value}
+        for (user_id, direction, metric, key), value in totals.items() if value
+    ]
+    if rows:
+        db.execute(insert(TaskStat.__table__), rows)
+    return len(tasks)
+
+def summarize_stats(rows, days: int) -> TaskStatsResponse:
+    """Fold one direction's TaskStat rows into the response"""
+    by_status, per_day, buckets = {}, {}, {}
+    for metric, key, value in rows:
+        if metric == "status":
+            by_status[key] = value
+        elif metric == "completed_on":
+            per_day[key] = value
+        elif metric == "duration":
+            buckets[int(key)] = value
+    
+    today = datetime.utcnow().date()
+    completed_per_day = {}
+    for offset in range(days - 1, -1, -1):
+        day = (today - timedelta(days=offset)).isoformat()
+        completed_per_day[day] = per_day.get(day, 0)
+    
+    # Walk the buckets to the middle completion, interpolating within [2^b, 2^(b+1))
+    median = None
+    remaining = sum(buckets.values()) / 2
+    for bucket in sorted(buckets):
+        count = buckets[bucket]
+        if count and remaining <= count:
+            median = 2 ** (bucket + remaining / count)
+            break
+        remaining -= count
+    
+    return TaskStatsResponse(
+        total=sum(by_status.values()),
+        by_status={status: count for status, count in by_status.items() if count},
+        completed_per_day=completed_per_day,
+        median_completion_seconds=median
+    )
+
+async def load_stats(db: AsyncSession, user_id: int, days: int) -> dict:
+    """One query for a user's (or everyone's, user_id 0) stats, grouped by direction"""
+    since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+    stmt = select(TaskStat.direction, TaskStat.metric, TaskStat.key, TaskStat.value).filter(
+        TaskStat.user_id == user_id,
+        or_(TaskStat.metric != "completed_on", TaskStat.key >= since)
+    )
+    grouped = {}
+    for direction, metric, key, value in (await db.execute(stmt)).all():
+        grouped.setdefault(direction, []).append((metric, key, value))
+    return grouped
+
+# Full-text search
+# One row per task (title + description) and per note (content), in an FTS5 table on
+# SQLite and a table with a generated tsvector column and GIN index on Postgres.
+# Rows are keyed by doc_id = entity_id * 2 + kind so writes can replace them by key.
+SEARCH_KINDS = {"task": 0, "note": 1}
+SEARCH_ID_COLUMN = "rowid" if is_sqlite else "doc_id"
+
+if is_sqlite:
+    SEARCH_DDL = (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_documents USING fts5("
+        "kind UNINDEXED, entity_id UNINDEXED, task_id UNINDEXED, title, body, tokenize='porter unicode61')"
+    )
+    SEARCH_INDEXES = {}
+    # Ranked and cut to one page inside FTS5, so highlight()/snippet() only run on
+    # the rows returned; FTS5 only sorts efficiently on a bare ORDER BY rank.
+    # bm25() weights are per column: title matches count ten times body matches.
+    SEARCH_SQL = text("""
+        SELECT d.kind, d.entity_id, d.task_id, tasks.title AS task_title, d.title, d.snippet, d.score
+        FROM (
+            SELECT kind, entity_id, task_id, rowid AS doc_id,
+                   highlight(search_documents, 3, '<mark>', '</mark>') AS title,
+                   snippet(search_documents, 4, '<mark>', '</mark>', '…', 24) AS snippet,
+                   -rank AS score
+            FROM search_documents
+            WHERE search_documents MATCH :q AND rank MATCH 'bm25(0.0, 0.0, 0.0, 10.0, 1.0)'
+            ORDER BY rank
+            LIMIT :limit OFFSET :offset
+        ) AS d
+        JOIN tasks ON tasks.id = d.task_id
+        ORDER BY d.score DESC, d.doc_id
+    """)
+else:
+    SEARCH_DDL = (
+        "CREATE TABLE IF NOT EXISTS search_documents ("
+        "doc_id BIGINT PRIMARY KEY, kind VARCHAR NOT NULL, entity_id INTEGER NOT NULL, "
+        "task_id INTEGER NOT NULL, title TEXT, body TEXT, "
+        "document tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED)"
+    )
+    SEARCH_INDEXES = {
+        "ix_search_documents_document": "CREATE INDEX ix_search_documents_document ON search_documents USING GIN (document)"
+    }
+    SEARCH_SQL = text("""
+        SELECT d.kind, d.entity_id, d.task_id, t.title AS task_title,
+               ts_headline('english', coalesce(d.title, ''), query, 'StartSel=<mark>, StopSel=</mark>, HighlightAll=true') AS title,
+               ts_headline('english', coalesce(d.body, ''), query, 'StartSel=<mark>, StopSel=</mark>, MaxWords=24, MinWords=8') AS snippet,
+               ts_rank(d.document, query) AS score
+        FROM search_documents AS d
+        JOIN tasks AS t ON t.id = d.task_id
+        CROSS JOIN websearch_to_tsquery('english', :q) AS query
+        WHERE d.document @@ query
+        ORDER BY score DESC, d.doc_id
+        LIMIT :limit OFFSET :offset
+    """)
+
+SEARCH_DELETE = text(f"DELETE FROM search_documents WHERE {SEARCH_ID_COLUMN} = :doc_id")
+SEARCH_INSERT = text(
+    f"INSERT INTO search_documents ({SEARCH_ID_COLUMN}, kind, entity_id, task_id, title, body) "
+    "VALUES (:doc_id, :kind, :entity_id, :task_id, :title, :body)"
+)
+
+def search_doc(kind: str, entity_id: int, task_id: int, title: Optional[str], body: Optional[str]) -> dict:
+    return {
+        "doc_id": entity_id * 2 + SEARCH_KINDS[kind], "kind": kind,
+        "entity_id": entity_id, "task_id": task_id, "title": title, "body": body
+    }
+
+async def index_documents(db: AsyncSession, docs: list):
+    """Add or replace search documents (see search_doc) in the caller's transaction"""
+    if not docs:
+        return
+    await db.execute(SEARCH_DELETE, [{"doc_id": doc["doc_id"]} for doc in docs])
+    await db.execute(SEARCH_INSERT, docs)
+
+async def unindex_documents(db: AsyncSession, kind: str, entity_ids):
+    params = [{"doc_id": entity_id * 2 + SEARCH_KINDS[kind]} for entity_id in entity_ids]
+    if params:
+        await db.execute(SEARCH_DELETE, params)
+
+def rebuild_search_index(db) -> int:
+    """Repopulate search_documents from the tasks and notes tables; returns the document count"""
+    db.execute(text("DELETE FROM search_documents"))
+    tasks = select(Task.id, Task.id.label("task_id"), Task.title, Task.description)
+    notes = select(Note.id, Note.task_id, null(), Note.content)
+    docs = [search_doc("task", *row) for row in db.execute(tasks)]
+    docs += [search_doc("note", *row) for row in db.execute(notes)]
+    if docs:
+        db.execute(SEARCH_INSERT, docs)
+    return len(docs)
+
+def search_match(q: str) -> Optional[str]:
+    """
+    The MATCH argument for a user's query. SQLite gets each word quoted (so FTS5
+    syntax in the input is inert) with prefix matching on the last one; Postgres
+    parses the raw text with websearch_to_tsquery.
+    """
+    if not is_sqlite:
+        return q
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+# Response cache
+# GET responses are cached by path and sorted query string and tagged by what they
+# depend on. Writes bump the generation of the tags they affect; an entry is only
+# served while every tag still has the generation it was computed under, so a
+# response computed concurrently with a write is never served after it.
+CACHED_ROUTES = [
+    (re.compile(r"/users"), lambda match: ("users",)),
+    (re.compile(r"/tasks/(\d+)"), lambda match: (f"task:{match[1]}",)),
+    (re.compile(r"/tasks|/tasks/my-view|/stats|/users/\d+/stats|/search"), lambda match: ("task-lists",)),
+]
+
+# Hits and misses are counted by the middleware, evictions and expirations by the backend
+cache_metrics = Counter()
+
+def cache_tags_for(path: str):
+    for pattern, tags in CACHED_ROUTES:
+        match = pattern.fullmatch(path)
+        if match:
+            return tags(match)
+    return None
+
+def cache_key(scope) -> str:
+    query = sorted(Request(scope).query_params.multi_items())
+    return f"{scope['path']}?{urlencode(query)}"
+
+class MemoryResponseCache:
+    """Per-worker LRU with a TTL; invalidation drops the affected entries right away"""
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (expires_at, entry)
+        self.tag_keys = {}  # tag -> keys of the entries depending on it
+        self.generations = Counter()
+        self.size = 0
+    
+    async def lookup(self, key: str, tags):
+        generations = {tag: self.generations[tag] for tag in tags}
+        cached = self.entries.get(key)
+        if cached is None:
+            return None, generations
+        expires_at, entry = cached
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            cache_metrics["expirations"] += 1
+            return None, generations
+        self.entries.move_to_end(key)
+        return entry, generations
+    
+    async def store(self, key: str, entry: dict):
+        if any(self.generations[tag] != generation for tag, generation in entry["generations"].items()):
+            return
+        self._remove(key)
+        self.entries[key] = (time.monotonic() + self.ttl, entry)
+        self.size += len(entry["body"])
+        for tag in entry["generations"]:
+            self.tag_keys.setdefault(tag, set()).add(key)
+        
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            cache_metrics["evictions"] += 1
+    
+    async def invalidate(self, tags):
+        for tag in tags:
+            self.generations[tag] += 1
+            for key in self.tag_keys.pop(tag, ()):
+                if self._remove(key):
+                    cache_metrics["invalidations"] += 1
+    
+    async def usage(self) -> dict:
+        return {"entries": len(self.entries), "bytes": self.size}
+    
+    def _remove(self, key: str) -> bool:
+        cached = self.entries.pop(key, None)
+        if cached is None:
+            return False
+        entry = cached[1]
+        self.size -= len(entry["body"])
+        for tag in entry["generations"]:
+            keys = self.tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tag_keys[tag]
+        return True
+
+class DatabaseResponseCache:
+    """
+    Shared cache using the app database as a stand-in for an external store such as
+    Redis: entries live in response_cache and tag generations in response_cache_tags,
+    so a write on one worker invalidates what every worker would serve. Entries made
+    stale by a write are replaced on the next miss or pruned once expired.
+    """
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS, max_bytes: int = CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+    
+    async def lookup(self, key: str, tags):
+        async with AsyncSessionLocal() as db:
+            stmt = select(CacheTagRecord.tag, CacheTagRecord.generation).filter(CacheTagRecord.tag.in_(tags))
+            generations = {tag: 0 for tag in tags} | dict((await db.execute(stmt)).all())
+            record = await db.get(CachedResponseRecord, key)
+            if record is None:
+                return None, generations
+            if record.expires_at <= datetime.utcnow():
+                await db.delete(record)
+                await db.commit()
+                cache_metrics["expirations"] += 1
+                return None, generations
+            entry = {
+                "generations": json.loads(record.generations),
+                "headers": json.loads(record.headers),
+                "body": record.body
+            }
+            return entry, generations
+    
+    async def store(self, key: str, entry: dict):
+        if len(entry["body"]) > self.max_bytes:
+            return
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            await db.execute(delete(CachedResponseRecord).filter(
+                or_(CachedResponseRecord.key == key, CachedResponseRecord.expires_at <= now)
+            ))
+            db.add(CachedResponseRecord(
+                key=key,
+                generations=json.dumps(entry["generations"]),
+                headers=json.dumps(entry["headers"]),
+                body=entry["body"],
+                expires_at=now + timedelta(seconds=self.ttl)
+            ))
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Another worker stored the same key first; its copy is as good as ours
+                await db.rollback()
+    
+    async def invalidate(self, tags):
+        async with AsyncSessionLocal() as db:
+            for tag in tags:
+                result = await db.execute(update(CacheTagRecord).filter(CacheTagRecord.tag == tag).values(
+                    generation=CacheTagRecord.generation + 1
+                ))
+                if result.rowcount == 0:
+                    db.add(CacheTagRecord(tag=tag, generation=1))
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Another worker created the tag concurrently; bump it again now that it exists
+                await db.rollback()
+                await db.execute(update(CacheTagRecord).filter(CacheTagRecord.tag.in_(tags)).values(
+                    generation=CacheTagRecord.generation + 1
+                ))
+                await db.commit()
+        cache_metrics["invalidations"] += len(tags)
+    
+    async def usage(self) -> dict:
+        async with AsyncSessionLocal() as db:
+            stmt = select(func.count(), func.coalesce(func.sum(func.length(CachedResponseRecord.body)), 0))
+            entries, size = (await db.execute(stmt)).one()
+            return {"entries": entries, "bytes": size}
+
+response_cache = {
+    "memory": MemoryResponseCache,
+    "database": DatabaseResponseCache
+}.get(CACHE_BACKEND, lambda: None)()
+
+async def invalidate_responses(*task_ids: int):
+    """Drop cached responses that can include the given tasks. Never fails the write that called it."""
+    if response_cache is None:
+        return
+    try:
+        await response_cache.invalidate(["task-lists", *(f"task:{task_id}" for task_id in sorted(set(task_ids)))])
+    except Exception as e:
+        print(f"⚠️ Response cache not invalidated: {e}")
+
+class ResponseCacheMiddleware:
+    """
+    Serves cacheable GETs from response_cache and stores their 200 responses.
+    A hit whose ETag matches If-None-Match is answered with a bare 304.
+    """
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        tags = None
+        if response_cache is not None and scope["type"] == "http" and scope["method"] == "GET":
+            tags = cache_tags_for(scope["path"])
+        if tags is None:
+            await self.app(scope, receive, send)
+            return
+        
+        key = cache_key(scope)
+        try:
+            entry, generations = await response_cache.lookup(key, tags)
+        except Exception as e:
+            print(f"⚠️ Response cache lookup warning: {e}")
+            await self.app(scope, receive, send)
+            return
+        
+        if entry is not None and entry["generations"] == generations:
+            cache_metrics["hits"] += 1
+            await self._replay(scope, send, entry)
+            return
+        cache_metrics["misses"] += 1
+        
+        start = None
+        chunks = []
+        
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                message = {**message, "headers": [*message["headers"], (b"x-cache", b"MISS")]}
+            elif message["type"] == "http.response.body" and start["status"] == 200:
+                chunks.append(message.get("body", b""))
+            await send(message)
+        
+        await self.app(scope, receive, capture)
+        
+        if start is None or start["status"] != 200:
+            return
+        entry = {
+            "generations": generations,
+            "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in start["headers"]],
+            "body": b"".join(chunks)
+        }
+        try:
+            await response_cache.store(key, entry)
+        except Exception as e:
+            print(f"⚠️ Response cache store warning: {e}")
+    
+    async def _replay(self, scope, send, entry: dict):
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in entry["headers"]]
+        etag = next((value for name, value in entry["headers"] if name == "etag"), None)
+        if etag is not None and is_not_modified(Request(scope), etag):
+            headers = [(name, value) for name, value in headers if name in (b"etag", b"cache-control")]
+            await send({"type": "http.response.start", "status": 304, "headers": [*headers, (b"x-cache", b"HIT")]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": [*headers, (b"x-cache", b"HIT")]})
+        await send({"type": "http.response.body", "body": entry["body"]})
+
+# Request metrics
+# RequestMetricsMiddleware times every request and tallies what it spent on SQL (through
+# engine events), on serializing the response and the bytes it sent. Serialization is
+# render()/render_fast() inside the endpoint plus everything between the endpoint returning
+# and the response starting (FastAPI applying the response_model; see TimedRoute).
+# Totals per route are served from GET /metrics in Prometheus text format, each response
+# gets them in a Server-Timing header, and slow requests are logged with their SQL.
+SLOW_REQUEST_MAX_STATEMENTS = 50
+
+class RequestTimings:
+    """What the current request has spent so far"""
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.endpoint_returned = None  # perf_counter() when the endpoint returned, set by TimedRoute
+        self.statements = []  # (sql, seconds) for the slow-request log, up to SLOW_REQUEST_MAX_STATEMENTS
+    
+    def server_timing(self, total: float) -> str:
+        return (
+            f'db;dur={self.sql_seconds * 1000:.1f};desc="{self.sql_count} queries", '
+            f"ser;dur={self.serialize_seconds * 1000:.1f}, total;dur={total * 1000:.1f}"
+        )
+
+# Set by the middleware for the duration of a request; None outside requests (startup, CLI)
+request_timings = contextvars.ContextVar("request_timings", default=None)
+
+@contextlib.contextmanager
+def timed_serialization():
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = request_timings.get()
+        if timings is not None:
+            timings.serialize_seconds += time.perf_counter() - start
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if request_timings.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = request_timings.get()
+    if timings is None or not conn.info.get("query_start"):
+        return
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    timings.sql_count += 1
+    timings.sql_seconds += elapsed
+    if SLOW_REQUEST_MS and len(timings.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+        timings.statements.append((statement, elapsed))
+
+for instrumented_engine in {engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+    event.listen(instrumented_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(instrumented_engine, "after_cursor_execute", _after_cursor_execute)
+
+def _mark_endpoint_returned():
+    timings = request_timings.get()
+    if timings is not None:
+        timings.endpoint_returned = time.perf_counter()
+
+class TimedRoute(APIRoute):
+    """APIRoute that notes when its endpoint returns, so what FastAPI does afterwards counts as serialization"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        call = self.dependant.call
+        # Same kind of callable as the endpoint, since FastAPI checks which to await or run in a thread
+        if asyncio.iscoroutinefunction(call):
+            async def timed_call(**values):
+                try:
+                    return await call(**values)
+                finally:
+                    _mark_endpoint_returned()
+        else:
+            def timed_call(**values):
+                try:
+                    return call(**values)
+                finally:
+                    _mark_endpoint_returned()
+        self.dependant.call = timed_call
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        # Cache hits are answered before routing
+        route = next((r for r in scope["app"].router.routes if isinstance(r, APIRoute) and r.matches(scope)[0] == Match.FULL), None)
+    return route.path if route is not None else "unmatched"
+
+class RequestMetrics:
+    """Per-route request totals for this worker, keyed by (method, route, status)"""
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    
+    def __init__(self):
+        self.routes = {}
+    
+    def record(self, labels: tuple, seconds: float, timings: RequestTimings, response_bytes: int):
+        stats = self.routes.get(labels)
+        if stats is None:
+            stats = self.routes[labels] = {"buckets": [0] * len(self.LATENCY_BUCKETS), "totals": Counter()}
+        bucket = next((i for i, limit in enumerate(self.LATENCY_BUCKETS) if seconds <= limit), None)
+        if bucket is not None:
+            stats["buckets"][bucket] += 1
+        stats["totals"].update({
+            "count": 1,
+            "seconds": seconds,
+            "sql_statements": timings.sql_count,
+            "sql_seconds": timings.sql_seconds,
+            "serialize_seconds": timings.serialize_seconds,
+            "response_bytes": response_bytes
+        })
+    
+    def exposition(self) -> str:
+        """The metrics in Prometheus text format (version 0.0.4)"""
+        counters = {
+            "http_request_sql_statements_total": ("sql_statements", "SQL statements executed while serving requests"),
+            "http_request_sql_seconds_total": ("sql_seconds", "Time spent executing SQL while serving requests"),
+            "http_request_serialization_seconds_total": ("serialize_seconds", "Time spent serializing response bodies"),
+            "http_response_bytes_total": ("response_bytes", "Response body bytes sent"),
+        }
+        lines = [
+            "# HELP http_request_duration_seconds Time from receiving a request to sending the last of its response",
+            "# TYPE http_request_duration_seconds histogram"
+        ]
+        for labels, stats in sorted(self.routes.items()):
+            label_text = self._labels(labels)
+            cumulative = 0
+            for limit, count in zip(self.LATENCY_BUCKETS, stats["buckets"]):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{label_text},le="{limit}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{label_text},le="+Inf"}} {stats["totals"]["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{{{label_text}}} {stats["totals"]["seconds"]}')
+            lines.append(f'http_request_duration_seconds_count{{{label_text}}} {stats["totals"]["count"]}')
+        for name, (total, description) in counters.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, stats in sorted(self.routes.items()):
+                lines.append(f"{name}{{{self._labels(labels)}}} {stats['totals'][total]}")
+        return "\n".join(lines) + "\n"
+    
+    @staticmethod
+    def _labels(labels: tuple) -> str:
+        method, route, status = (value.replace("\\", "\\\\").replace('"', '\\"') for value in labels)
+        return f'method="{method}",route="{route}",status="{status}"'
+
+request_metrics = RequestMetrics()
+
+def log_slow_request(scope, status: int, elapsed: float, timings: RequestTimings):
+    query = scope.get("query_string", b"").decode("latin-1")
+    lines = [
+        f"⚠️ Slow request: {scope['method']} {scope['path']}{'?' + query if query else ''} -> {status} "
+        f"in {elapsed * 1000:.0f}ms ({timings.sql_count} SQL statement(s) in {timings.sql_seconds * 1000:.0f}ms, "
+        f"serialization {timings.serialize_seconds * 1000:.0f}ms)"
+    ]
+    for statement, seconds in timings.statements:
+        lines.append(f"    {seconds * 1000:8.1f}ms  {' '.join(statement.split())}")
+    if timings.sql_count > len(timings.statements):
+        lines.append(f"    ... and {timings.sql_count - len(timings.statements)} more")
+    print("\n".join(lines))
+
+class RequestMetricsMiddleware:
+    """Times each request into request_metrics and adds a Server-Timing header"""
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+        streaming = False
+        sent = 0
+        
+        async def instrument(message):
+            nonlocal status, streaming, sent
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                status = message["status"]
+                streaming = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream") for name, value in message["headers"]
+                )
+                if timings.endpoint_returned is not None:
+                    timings.serialize_seconds += now - timings.endpoint_returned
+                server_timing = timings.server_timing(now - start).encode()
+                message = {**message, "headers": [*message["headers"], (b"server-timing", server_timing)]}
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, instrument)
+        finally:
+            request_timings.reset(token)
+            elapsed = time.perf_counter() - start
+            request_metrics.record((scope["method"], route_label(scope), str(status)), elapsed, timings, sent)
+            # An event stream is slow by design
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS and not streaming:
+                log_slow_request(scope, status, elapsed, timings)
+
+# Upload size limit
+# Starlette spools the whole multipart body to a temp file before upload_attachment runs,
+# so bodies that can't fit under MAX_UPLOAD_SIZE are turned away before they are read.
+UPLOAD_ROUTE = re.compile(r"^/notes/[^/]+/attachments$")
+# Room for the multipart boundary and part headers around the file itself
+MAX_UPLOAD_REQUEST_SIZE = MAX_UPLOAD_SIZE + 64 * 1024
+
+class UploadSizeLimitMiddleware:
+    """
+    Answers 413 to attachment uploads whose Content-Length is over MAX_UPLOAD_REQUEST_SIZE,
+    and stops reading a body sent without one once it passes that size.
+    """
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not UPLOAD_ROUTE.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > MAX_UPLOAD_REQUEST_SIZE:
+            response = JSONResponse({"detail": "File size exceeds 10MB limit"}, status_code=413)
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > MAX_UPLOAD_REQUEST_SIZE:
+                    # Raised while FastAPI parses the form, which re-raises HTTPExceptions as they are
+                    raise HTTPException(status_code=413, detail="File size exceeds 10MB limit")
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+# Change feed
+class ChangeFeed:
+    """
+    In-process fan-out of change events to SSE subscribers, keeping the most recent
+    events so a reconnecting client can resume from its Last-Event-ID.
+    """
+    def __init__(self, backlog: int = EVENT_BACKLOG):
+        self.recent = deque(maxlen=backlog)
+        self.subscribers = set()
+        self.last_id = 0
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=EVENT_BACKLOG)
+        self.subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+    
+    def dispatch(self, change: dict):
+        self.last_id = max(self.last_id, change["id"])
+        self.recent.append(change)
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(change)
+            except asyncio.QueueFull:
+                # A stalled client is dropped; it can reconnect and resume from the backlog
+                self.subscribers.discard(queue)
+    
+    def replay(self, after_id: int):
+        """Events newer than `after_id`, or None if some of them are no longer buffered"""
+        oldest_id = self.recent[0]["id"] if self.recent else self.last_id + 1
+        if after_id > self.last_id or oldest_id > after_id + 1:
+            return None
+        return [change for change in self.recent if change["id"] > after_id]
+
+class MemoryEventBackend:
+    """Single-worker backend: events go straight to this process's feed"""
+    def __init__(self, feed: ChangeFeed):
+        self.feed = feed
+        self.next_id = 0
+    
+    async def publish(self, change: dict):
+        self.next_id += 1
+        self.feed.dispatch({"id": self.next_id, **change})
+    
+    async def start(self):
+        pass
+    
+    async def stop(self):
+        pass
+
+class DatabaseEventBackend:
+    """
+    Multi-worker backend using the app database as a stand-in broker: events are
+    appended to change_events and every worker polls for new rows into its own feed,
+    so event IDs (and Last-Event-ID resume) are shared across workers.
+    """
+    def __init__(self, feed: ChangeFeed, poll_interval: float = EVENT_POLL_INTERVAL):
+        self.feed = feed
+        self.poll_interval = poll_interval
+        self.last_id = 0
+        self._task = None
     
-    id: int
-    username: str
-    display_name: str
+    async def publish(self, change: dict):
+        async with AsyncSessionLocal() as db:
+            db.add(ChangeEventRecord(payload=json.dumps(change)))
+            await db.commit()
+    
+    async def start(self):
+        # Preload the replay buffer so clients can resume across restarts
+        async with AsyncSessionLocal() as db:
+            stmt = select(ChangeEventRecord).order_by(ChangeEventRecord.id.desc()).limit(EVENT_BACKLOG)
+            for row in reversed((await db.execute(stmt)).scalars().all()):
+                self.feed.dispatch({"id": row.id, **json.loads(row.payload)})
+                self.last_id = row.id
+        self._task = asyncio.create_task(self._poll())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+    
+    async def _poll(self):
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    stmt = select(ChangeEventRecord).filter(ChangeEventRecord.id > self.last_id)
+                    rows = (await db.execute(stmt.order_by(ChangeEventRecord.id))).scalars().all()
+                    for row in rows:
+                        self.feed.dispatch({"id": row.id, **json.loads(row.payload)})
+                        self.last_id = row.id
+                    
+                    # Rows older than any worker's replay buffer are no use to anyone
+                    if rows:
+                        await db.execute(delete(ChangeEventRecord).filter(
+                            ChangeEventRecord.id <= self.last_id - EVENT_BACKLOG
+                        ))
+                        await db.commit()
+            except Exception as e:
+                print(f"⚠️ Change feed poll warning: {e}")
+            await asyncio.sleep(self.poll_interval)
 
-class TaskBase(BaseModel):
-    title: str
-    description: str
-    assigned_to: int
+change_feed = ChangeFeed()
+event_backend = (DatabaseEventBackend if EVENT_BACKEND == "database" else MemoryEventBackend)(change_feed)
 
-class TaskCreate(TaskBase):
-    assigned_by: Optional[int] = None
+# Set from the X-Client-Id header, so a client can recognise the events its own writes caused
+request_client_id = contextvars.ContextVar("request_client_id", default=None)
 
-class TaskUpdate(BaseModel):
-    title: Optional[str] = None
-    description: Optional[str] = None
-    assigned_to: Optional[int] = None
-    status: Optional[str] = None
+class ClientIdMiddleware:
+    """Exposes the caller's X-Client-Id header to publish_change for the duration of a request"""
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        client_id = next((value for name, value in scope["headers"] if name == b"x-client-id"), None)
+        token = request_client_id.set(client_id.decode("latin-1")[:64] if client_id else None)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_client_id.reset(token)
 
-class TaskResponse(TaskBase):
-    model_config = ConfigDict(from_attributes=True)
+async def publish_change(event_type: str, task_id: int, entity_id: int, users, invalidate: bool = True):
+    """
+    Announce a committed change and, unless the caller already did, drop the cached
+    responses it affects. `users` are the IDs the change concerns (assignee, assigner,
+    previous assignee) and drive per-user filtering on /events.
+    A failure here never fails the request that made the change.
+    """
+    if invalidate:
+        await invalidate_responses(task_id)
     
-    id: int
-    status: str
-    created_at: datetime
-    completed_at: Optional[datetime]
-    assigned_by: Optional[int] = None
-    assigned_user: UserResponse
-    assigner: Optional[UserResponse] = None
-    notes: List[NoteResponse] = []
+    change = {
+        "type": event_type,
+        "task_id": task_id,
+        "entity_id": entity_id,
+        "users": sorted({user for user in users if user}),
+        "at": datetime.utcnow().isoformat()
+    }
+    if request_client_id.get():
+        change["client_id"] = request_client_id.get()
+    try:
+        await event_backend.publish(change)
+    except Exception as e:
+        print(f"⚠️ Change event not published: {e}")
 
-class MyTasksViewResponse(BaseModel):
-    assigned_to_me: List[TaskResponse]
-    assigned_by_me: List[TaskResponse]
-    all_tasks: List[TaskResponse]
+def task_users(task) -> list:
+    return [task.assigned_to, task.assigned_by]
+
+def format_sse(change: dict) -> str:
+    return f"id: {change['id']}\ndata: {json.dumps(change, separators=(',', ':'))}\n\n"
+
+async def stream_changes(request: Request, queue: asyncio.Queue, user_id: Optional[int], last_event_id: Optional[int]):
+    try:
+        last_sent = last_event_id
+        if last_event_id is not None:
+            backlog = change_feed.replay(last_event_id)
+            if backlog is None:
+                # Too far behind to replay; the client should refetch and carry on from here
+                last_sent = change_feed.last_id
+                yield format_sse({"id": last_sent, "type": "reset"})
+            else:
+                for change in backlog:
+                    last_sent = change["id"]
+                    if user_id is None or user_id in change["users"]:
+                        yield format_sse(change)
+        
+        while queue in change_feed.subscribers and not await request.is_disconnected():
+            try:
+                change = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            # Already sent from the backlog
+            if last_sent is not None and change["id"] <= last_sent:
+                continue
+            last_sent = change["id"]
+            if user_id is None or user_id in change["users"]:
+                yield format_sse(change)
+    finally:
+        change_feed.unsubscribe(queue)
 
 # Initialize FastAPI app
 app = FastAPI(title="Task Tracker API", version="1.0.0")
+app.router.route_class = TimedRoute
 
 # Mount uploads directory for static file serving
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
+# Response cache - added first so CORS headers are applied to cached responses too
+app.add_middleware(ResponseCacheMiddleware)
+
+# Upload size limit - turns oversized uploads away before their body is read
+app.add_middleware(UploadSizeLimitMiddleware)
+
+# Client ID - tags change events with the client whose write caused them
+app.add_middleware(ClientIdMiddleware)
+
+# Request metrics - outside the cache, so hits are timed and no Server-Timing header is cached
+app.add_middleware(RequestMetricsMiddleware)
+
 # CORS middleware - allows frontend to communicate with backend
 app.add_middleware(
     CORSMiddleware,
@@ -163,25 +1984,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Cache", "Server-Timing"],
 )
 
 # Database dependency
-def get_db():
-    db = SessionLocal()
-    try:
+# SQLite takes one writer at a time. Write requests queue here, first come first served,
+# instead of racing for the database lock mid-request and failing with "database is locked".
+# Taken before the version row locks, so the lock order stays the same.
+sqlite_writer = asyncio.Lock() if is_sqlite else None
+
+async def get_db():
+    """Session for read-only endpoints"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+@contextlib.asynccontextmanager
+async def write_session():
+    """Session for writing; on SQLite the writer queue is held until it closes"""
+    async with sqlite_writer or contextlib.nullcontext():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+async def get_write_db():
+    """Session for endpoints that write; on SQLite the request holds the writer queue throughout"""
+    async with write_session() as db:
         yield db
-    finally:
-        db.close()
 
 # Initialize database and seed data
 def init_db():
-    """Create tables and seed initial data"""
-    try:
-        Base.metadata.create_all(bind=engine)
-    except Exception as e:
-        print(f"⚠️ Warning creating tables: {e}")
-        return
-    
+    """Seed initial data into an empty database and build derived tables that are missing"""
     db = SessionLocal()
     try:
         # Check if users already exist
@@ -246,29 +2077,275 @@ def init_db():
                 note_2 = Note(task_id=task_1.id, content="Configured virtual environment successfully")
                 db.add(note_1)
                 db.add(note_2)
+                db.flush()
+                repair_counters(db)
                 db.commit()
             
             print("✅ Database initialized with sample data")
+        
+        # Summary table behind /stats, built once for databases that predate it
+        if db.query(TaskStat).first() is None and db.query(Task).first() is not None:
+            print(f"✅ Built task stats from {rebuild_task_stats(db)} task(s)")
+            db.commit()
+        
+        # Search documents, built once for databases that predate the index
+        if db.execute(text("SELECT 1 FROM search_documents LIMIT 1")).first() is None and db.query(Task).first() is not None:
+            print(f"✅ Indexed {rebuild_search_index(db)} document(s) for search")
+            db.commit()
+        
+        # Revision counters behind the list ETags
+        existing_scopes = {name for (name,) in db.query(DataVersion.name)}
+        for scope in DATA_VERSION_SCOPES:
+            if scope not in existing_scopes:
+                db.add(DataVersion(name=scope, version=0))
+        db.commit()
     finally:
         db.close()
 
-def ensure_schema():
-    """Ensure required columns exist (lightweight runtime migration)."""
+def schema_is_current() -> bool:
+    """True when every migration has been applied, so startup has no DDL to run"""
     try:
-        with engine.begin() as conn:
-            inspector = inspect(conn)
-            if "tasks" not in inspector.get_table_names():
-                return
-
-            columns = {col["name"] for col in inspector.get_columns("tasks")}
-            if "assigned_by" not in columns:
-                if is_sqlite:
-                    conn.execute(text("ALTER TABLE tasks ADD COLUMN assigned_by INTEGER"))
+        with engine.connect() as conn:
+            return applied_version(conn) >= SCHEMA_VERSION
+    except Exception:
+        # No schema_version table yet
+        return False
+
+# Schema migrations
+# Applied in order by `python main.py migrate`, and at startup unless MIGRATE_ON_STARTUP
+# is off. Each step is recorded in schema_version once it succeeds and must be safe to
+# run again: the first step's create_all already builds the current tables on a new
+# database, and a step can be interrupted before it's recorded. A step runs in one
+# transaction with its schema_version row, except online steps, which get an autocommit
+# connection so Postgres can build indexes with CREATE INDEX CONCURRENTLY.
+MIGRATIONS = []
+
+# pg_advisory_lock key held while migrating, so two deploys don't migrate at once
+MIGRATION_LOCK_KEY = 7_240_417
+
+def migration(version: int, description: str, online: bool = False):
+    def register(step):
+        MIGRATIONS.append(SimpleNamespace(version=version, description=description, online=online, step=step))
+        return step
+    return register
+
+def applied_version(conn) -> int:
+    return conn.scalar(select(func.max(SchemaVersion.version))) or 0
+
+def add_column(conn, table: str, column: str, column_type: str) -> bool:
+    """Add a column unless it already exists; True when it was added"""
+    if column in {col["name"] for col in inspect(conn).get_columns(table)}:
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+    print(f"✅ Added missing column: {table}.{column}")
+    return True
+
+def create_index(conn, name: str, ddl: str):
+    """
+    Run a CREATE [UNIQUE] INDEX statement unless the index exists. Postgres builds it
+    CONCURRENTLY, so writes to the table carry on meanwhile; an index left invalid by
+    an interrupted build is dropped and built again.
+    """
+    if is_sqlite:
+        state = conn.scalar(text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"), {"name": name})
+    else:
+        state = conn.scalar(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name})
+        if state is False:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    if state:
+        return
+    conn.execute(text(re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX" + ("" if is_sqlite else " CONCURRENTLY"), ddl)))
+    print(f"✅ Created index {name}")
+
+def drop_index(conn, name: str):
+    conn.execute(text(f"DROP INDEX {'' if is_sqlite else 'CONCURRENTLY '}IF EXISTS {name}"))
+
+@migration(1, "Create tables")
+def _create_tables(conn):
+    Base.metadata.create_all(bind=conn)
+
+@migration(2, "Add tasks.assigned_by")
+def _add_assigned_by(conn):
+    add_column(conn, "tasks", "assigned_by", "INTEGER REFERENCES users(id)")
+
+@migration(3, "Add attachments.sha256 for the blob store")
+def _add_attachment_sha256(conn):
+    add_column(conn, "attachments", "sha256", "VARCHAR")
+
+@migration(4, "Add updated_at to tasks, notes and attachments")
+def _add_updated_at(conn):
+    for table in ("tasks", "notes", "attachments"):
+        if add_column(conn, table, "updated_at", "TIMESTAMP"):
+            conn.execute(text(f"UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL"))
+
+@migration(5, "Add the task note/attachment counters")
+def _add_task_counters(conn):
+    added = [
+        add_column(conn, "tasks", "note_count", "INTEGER NOT NULL DEFAULT 0"),
+        add_column(conn, "tasks", "attachment_count", "INTEGER NOT NULL DEFAULT 0"),
+        add_column(conn, "tasks", "last_activity_at", "TIMESTAMP"),
+    ]
+    if any(added):
+        print(f"✅ Backfilled counters on {repair_counters(conn)} task(s)")
+
+@migration(6, "Create model indexes missing from existing tables", online=True)
+def _create_model_indexes(conn):
+    # Task list filters and keyset ordering, sync timestamps, attachment hashes
+    for table in Base.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            create_index(conn, index.name, str(CreateIndex(index).compile(dialect=conn.dialect)))
+
+@migration(7, "Drop ix_tasks_title", online=True)
+def _drop_title_index(conn):
+    # Nothing filters on title, so its index only slowed down writes
+    drop_index(conn, "ix_tasks_title")
+
+@migration(8, "Create the full-text search index", online=True)
+def _create_search_index(conn):
+    conn.execute(text(SEARCH_DDL))
+    for name, ddl in SEARCH_INDEXES.items():
+        create_index(conn, name, ddl)
+
+@migration(9, "Create the per-user keyset indexes without status", online=True)
+def _create_user_keyset_indexes(conn):
+    # Without them, per-user pages with no status filter sort all of the user's tasks
+    for index in Task.__table__.indexes:
+        if index.name in ("ix_tasks_assigned_to_created_at", "ix_tasks_assigned_by_created_at"):
+            create_index(conn, index.name, str(CreateIndex(index).compile(dialect=conn.dialect)))
+
+# The same check as a foreign key, for SQLite tables that can't have one added in place
+ASSIGNED_BY_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS {name} BEFORE {event} ON tasks
+WHEN NEW.assigned_by IS NOT NULL AND NOT EXISTS (SELECT 1 FROM users WHERE id = NEW.assigned_by)
+BEGIN SELECT RAISE(ABORT, 'FOREIGN KEY constraint failed'); END
+"""
+
+@migration(10, "Enforce tasks.assigned_by's foreign key on older databases")
+def _enforce_assigned_by_foreign_key(conn):
+    # Older databases got assigned_by without a foreign key, so a bad assigner wasn't rejected.
+    # Existing rows are left as they are; new writes are checked like any other user reference.
+    foreign_keys = inspect(conn).get_foreign_keys("tasks")
+    if any(fk["constrained_columns"] == ["assigned_by"] for fk in foreign_keys):
+        return
+    if is_sqlite:
+        conn.execute(text(ASSIGNED_BY_TRIGGER.format(name="tasks_assigned_by_insert_fk", event="INSERT")))
+        conn.execute(text(ASSIGNED_BY_TRIGGER.format(name="tasks_assigned_by_update_fk", event="UPDATE OF assigned_by")))
+    else:
+        conn.execute(text(
+            "ALTER TABLE tasks ADD CONSTRAINT tasks_assigned_by_fkey "
+            "FOREIGN KEY (assigned_by) REFERENCES users(id) NOT VALID"
+        ))
+    print("✅ Enforced the tasks.assigned_by foreign key")
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+def migrate() -> int:
+    """Apply pending migrations in order; returns how many ran"""
+    # Autocommit, since an open transaction here would stall the concurrent index builds
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        if not is_sqlite:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            with engine.begin() as conn:
+                SchemaVersion.__table__.create(conn, checkfirst=True)
+                current = applied_version(conn)
+            
+            pending = [m for m in MIGRATIONS if m.version > current]
+            for m in pending:
+                if m.online:
+                    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                        m.step(conn)
+                    with engine.begin() as conn:
+                        conn.execute(insert(SchemaVersion).values(version=m.version))
                 else:
-                    conn.execute(text("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS assigned_by INTEGER"))
-                print("✅ Added missing column: tasks.assigned_by")
-    except Exception as e:
-        print(f"⚠️ Schema check warning: {e}")
+                    with engine.begin() as conn:
+                        m.step(conn)
+                        conn.execute(insert(SchemaVersion).values(version=m.version))
+                print(f"✅ Applied migration {m.version}: {m.description}")
+        finally:
+            if not is_sqlite:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    return len(pending)
+
+def migration_status() -> list:
+    """(version, description, applied) for every migration"""
+    with engine.connect() as conn:
+        try:
+            applied = set(conn.scalars(select(SchemaVersion.version)))
+        except Exception:
+            applied = set()
+    return [(m.version, m.description, m.version in applied) for m in MIGRATIONS]
+
+def _advisor_queries():
+    """Representative statements issued by the task endpoints, with sample parameters"""
+    newest_first = (Task.created_at.desc(), Task.id.desc())
+    tasks = task_select()
+    page_limit = TASK_PAGE_SIZE + 1
+    before = tuple_(Task.created_at, Task.id) < (datetime.utcnow(), 1)
+    return {
+        "GET /tasks": tasks.order_by(*newest_first),
+        "GET /tasks?status": tasks.filter(Task.status == "Pending").order_by(*newest_first),
+        "GET /tasks?assigned_to": tasks.filter(Task.assigned_to == 1).order_by(*newest_first),
+        "GET /tasks?assigned_to&status": tasks.filter(
+            Task.assigned_to == 1, Task.status == "Pending"
+        ).order_by(*newest_first),
+        "GET /tasks?cursor": tasks.filter(before).order_by(*newest_first).limit(page_limit),
+        "GET /tasks/my-view assigned_to_me page": tasks.filter(
+            Task.assigned_to == 1, Task.status == "Pending", before
+        ).order_by(*newest_first).limit(page_limit),
+        "GET /tasks/my-view assigned_by_me page": tasks.filter(
+            Task.assigned_by == 1, Task.status == "Pending", before
+        ).order_by(*newest_first).limit(page_limit),
+        "GET /tasks/my-view assigned_to_me page, any status": tasks.filter(
+            Task.assigned_to == 1, before
+        ).order_by(*newest_first).limit(page_limit),
+        "GET /tasks/my-view assigned_by_me page, any status": tasks.filter(
+            Task.assigned_by == 1, before
+        ).order_by(*newest_first).limit(page_limit),
+        "GET /tasks/{task_id}": tasks.filter(Task.id == 1),
+        "eager load notes": select(Note).filter(Note.task_id.in_([1, 2, 3])),
+        "eager load attachments": select(Attachment).filter(Attachment.note_id.in_([1, 2, 3])),
+    }
+
+def explain_queries() -> int:
+    """
+    Run EXPLAIN on each endpoint query against DATABASE_URL and flag sequential
+    scans and sorts (an ordered query should walk an index in order instead).
+    Returns the number of flagged queries (used as the exit status).
+    """
+    flagged = 0
+    db = SessionLocal()
+    try:
+        if not is_sqlite:
+            # With seq scans priced out, any that remain have no usable index
+            db.execute(text("SET LOCAL enable_seqscan = off"))
+        
+        for name, stmt in _advisor_queries().items():
+            sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+            if is_sqlite:
+                plan = [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+                seq_scans = [line for line in plan if line.startswith("SCAN ") and " USING " not in line]
+                sorts = [line for line in plan if line.startswith("USE TEMP B-TREE FOR ORDER BY")]
+            else:
+                plan = [row[0] for row in db.execute(text(f"EXPLAIN {sql}"))]
+                seq_scans = [line for line in plan if "Seq Scan" in line]
+                sorts = [line for line in plan if re.match(r"\s*(->\s*)?(Incremental )?Sort\b", line)]
+            
+            print(f"{'⚠️' if seq_scans or sorts else '✅'} {name}")
+            for line in plan:
+                print(f"    {line}")
+            if seq_scans:
+                print(f"    -> sequential scan: {'; '.join(line.strip() for line in seq_scans)}")
+            if sorts:
+                print(f"    -> sort: {'; '.join(line.strip() for line in sorts)}")
+            if seq_scans or sorts:
+                flagged += 1
+    finally:
+        db.rollback()
+        db.close()
+    
+    print(f"\n{flagged} quer{'y' if flagged == 1 else 'ies'} with sequential scans or sorts")
+    return flagged
 
 # API Endpoints
 
@@ -276,12 +2353,26 @@ def ensure_schema():
 async def startup_event():
     """Initialize database on startup"""
     try:
-        Base.metadata.create_all(bind=engine)
-        ensure_schema()
+        if schema_is_current():
+            print(f"✅ Database schema is current (version {SCHEMA_VERSION})")
+        elif MIGRATE_ON_STARTUP:
+            migrate()
+        else:
+            print(f"⚠️ Database schema is behind version {SCHEMA_VERSION}; run `python main.py migrate`")
         init_db()
         print("✅ Database initialized with tables and seed data")
     except Exception as e:
         print(f"⚠️ Database initialization warning: {e}")
+    
+    await event_backend.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the change feed and close pooled async connections"""
+    await event_backend.stop()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
 
 @app.get("/")
 async def root():
@@ -297,39 +2388,143 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Response cache hit/miss/eviction counters for this worker, plus the cache's current size"""
+    if response_cache is None:
+        return {"backend": "off"}
+    counters = {name: cache_metrics[name] for name in ("hits", "misses", "evictions", "expirations", "invalidations")}
+    lookups = counters["hits"] + counters["misses"]
+    return {
+        "backend": CACHE_BACKEND,
+        **counters,
+        "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else None,
+        **await response_cache.usage()
+    }
+
+@app.get("/pool/stats")
+async def get_pool_stats():
+    """Connection pool settings, checkout wait times, saturation and churn for this worker"""
+    return {
+        "pre_ping": DB_POOL_PRE_PING,
+        "recycle_seconds": DB_POOL_RECYCLE,
+        "timeout_seconds": DB_POOL_TIMEOUT,
+        "pools": {name: pooled.pool.metrics.snapshot(pooled.pool) for name, pooled in request_pools.items()}
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-route latency histograms, SQL, serialization and response size totals for this worker, in Prometheus text format"""
+    return PlainTextResponse(request_metrics.exposition(), media_type="text/plain; version=0.0.4")
+
 @app.get("/users", response_model=List[UserResponse])
-async def get_users(db: Session = Depends(get_db)):
+async def get_users(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
     """Get all users"""
-    users = db.query(User).all()
+    not_modified = await check_not_modified(db, request, response, "users")
+    if not_modified:
+        return not_modified
+    
+    users = (await db.execute(select(User))).scalars().all()
     return users
 
+@app.get("/users/{user_id}/stats", response_model=UserStatsResponse)
+async def get_user_stats(
+    user_id: int,
+    request: Request,
+    response: Response,
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_db)
+):
+    """Task counts, daily completions and median completion time for tasks assigned to / by a user"""
+    not_modified = await check_not_modified(db, request, response)
+    if not_modified:
+        return not_modified
+    
+    if not await db.get(User, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    grouped = await load_stats(db, user_id, days)
+    return UserStatsResponse(
+        user_id=user_id,
+        assigned_to=summarize_stats(grouped.get("assigned_to", []), days),
+        assigned_by=summarize_stats(grouped.get("assigned_by", []), days)
+    )
+
+@app.get("/stats", response_model=TaskStatsResponse)
+async def get_stats(
+    request: Request,
+    response: Response,
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_db)
+):
+    """Task counts, daily completions and median completion time across all tasks"""
+    not_modified = await check_not_modified(db, request, response)
+    if not_modified:
+        return not_modified
+    
+    grouped = await load_stats(db, 0, days)
+    return summarize_stats(grouped.get("all", []), days)
+
 @app.get("/tasks", response_model=List[TaskResponse])
 async def get_tasks(
+    request: Request,
+    response: Response,
     assigned_to: Optional[int] = None,
     status: Optional[str] = None,
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=MAX_TASK_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get all tasks with optional filtering
     - assigned_to: Filter by user ID
     - status: Filter by status (Pending/Completed)
+    - limit / cursor: Page through results; the next page's cursor is
+      returned in the X-Next-Cursor header
+    - fields / expand: Return only some fields / nested collections
     """
-    query = db.query(Task)
+    schema = task_schema(fields, expand)
+    not_modified = await check_not_modified(db, request, response)
+    if not_modified:
+        return not_modified
+    
+    stmt = task_row_select(schema) if FAST_JSON else task_select(schema)
     
     if assigned_to:
-        query = query.filter(Task.assigned_to == assigned_to)
+        stmt = stmt.filter(Task.assigned_to == assigned_to)
     
     if status:
-        query = query.filter(Task.status == status)
+        stmt = stmt.filter(Task.status == status)
+    
+    if limit is None and cursor is None:
+        stmt = stmt.order_by(Task.created_at.desc(), Task.id.desc())
+        tasks = await fetch_tasks(db, stmt, FAST_JSON)
+    else:
+        position = decode_cursor(cursor) if cursor else None
+        tasks, next_position = await paginate_tasks(db, stmt, limit or TASK_PAGE_SIZE, position, FAST_JSON)
+        if next_position is not None:
+            response.headers["X-Next-Cursor"] = encode_cursor(next_position)
     
-    tasks = query.order_by(Task.created_at.desc()).all()
-    return tasks
+    if FAST_JSON:
+        return render_fast(await build_dicts(db, Task, schema, tasks), response.headers)
+    if schema is TaskResponse:
+        return tasks
+    return render(tasks, List[schema], request, headers=response.headers)
 
-@app.get("/tasks/my-view", response_model=MyTasksViewResponse)
+@app.get("/tasks/my-view", response_model=Union[MyTasksCompactResponse, MyTasksViewResponse])
 async def get_my_tasks_view(
+    request: Request,
+    response: Response,
     user_id: int,
     status: Optional[str] = None,
-    db: Session = Depends(get_db)
+    compact: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_TASK_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get tasks organized by view type for a specific user
@@ -337,185 +2532,563 @@ async def get_my_tasks_view(
     - assigned_to_me: Tasks assigned to the user
     - assigned_by_me: Tasks created/assigned by the user
     - all_tasks: All tasks
+    
+    With compact=true each task is sent once in a `tasks` map keyed by ID
+    and the three views are returned as ordered lists of task IDs.
+    
+    With limit/cursor each view is paged independently; pass next_cursor
+    back to fetch the following page of every view that has more rows.
+    
+    fields/expand narrow each task as on /tasks.
     """
+    schema = task_schema(fields, expand)
+    not_modified = await check_not_modified(db, request, response)
+    if not_modified:
+        return not_modified
+    
     # Verify user exists
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Build base queries
-    assigned_to_query = db.query(Task).filter(Task.assigned_to == user_id)
-    assigned_by_query = db.query(Task).filter(Task.assigned_by == user_id)
-    all_tasks_query = db.query(Task)
-    
-    # Apply status filter if provided
+    stmt = task_row_select(schema) if FAST_JSON else task_select(schema)
     if status:
-        assigned_to_query = assigned_to_query.filter(Task.status == status)
-        assigned_by_query = assigned_by_query.filter(Task.status == status)
-        all_tasks_query = all_tasks_query.filter(Task.status == status)
+        stmt = stmt.filter(Task.status == status)
+    
+    next_cursor = None
+    if limit is None and cursor is None:
+        # Every view is a subset of all_tasks, so fetch once and partition in memory
+        stmt = stmt.order_by(Task.created_at.desc(), Task.id.desc())
+        all_tasks = await fetch_tasks(db, stmt, FAST_JSON)
+        views = {
+            "assigned_to_me": [task for task in all_tasks if task.assigned_to == user_id],
+            "assigned_by_me": [task for task in all_tasks if task.assigned_by == user_id],
+            "all_tasks": all_tasks
+        }
+    else:
+        view_stmts = {
+            "assigned_to_me": stmt.filter(Task.assigned_to == user_id),
+            "assigned_by_me": stmt.filter(Task.assigned_by == user_id),
+            "all_tasks": stmt
+        }
+        positions = decode_cursor(cursor) if cursor else {}
+        if not isinstance(positions, dict):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        views, next_positions = {}, {}
+        for view, view_stmt in view_stmts.items():
+            # A view recorded as None in the cursor has no more pages
+            if view in positions and positions[view] is None:
+                views[view], next_positions[view] = [], None
+                continue
+            views[view], next_positions[view] = await paginate_tasks(
+                db, view_stmt, limit or TASK_PAGE_SIZE, positions.get(view), FAST_JSON
+            )
+        
+        if any(position is not None for position in next_positions.values()):
+            next_cursor = encode_cursor(next_positions)
     
-    # Execute queries and order by created_at
-    assigned_to_me = assigned_to_query.order_by(Task.created_at.desc()).all()
-    assigned_by_me = assigned_by_query.order_by(Task.created_at.desc()).all()
-    all_tasks = all_tasks_query.order_by(Task.created_at.desc()).all()
+    if compact:
+        payload = {
+            "tasks": {task.id: task for tasks in views.values() for task in tasks},
+            **{view: [task.id for task in tasks] for view, tasks in views.items()},
+            "next_cursor": next_cursor
+        }
+    else:
+        payload = {**views, "next_cursor": next_cursor}
     
-    return {
-        "assigned_to_me": assigned_to_me,
-        "assigned_by_me": assigned_by_me,
-        "all_tasks": all_tasks
-    }
+    if FAST_JSON:
+        # Views overlap, so each task is built once and shared between them
+        unique = {task.id: task for tasks in views.values() for task in tasks}
+        built = dict(zip(unique, await build_dicts(db, Task, schema, list(unique.values()))))
+        if compact:
+            payload["tasks"] = built
+        else:
+            payload.update({view: [built[task.id] for task in tasks] for view, tasks in views.items()})
+        return render_fast(payload, response.headers)
+    if schema is TaskResponse:
+        return payload
+    return render(payload, my_view_schema(schema, compact), request, headers=response.headers)
 
 @app.get("/tasks/{task_id}", response_model=TaskResponse)
-async def get_task(task_id: int, db: Session = Depends(get_db)):
-    """Get a specific task by ID"""
-    task = db.query(Task).filter(Task.id == task_id).first()
+async def get_task(
+    task_id: int,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a specific task by ID; fields/expand narrow it as on /tasks"""
+    schema = task_schema(fields, expand)
+    not_modified = await check_not_modified(db, request, response)
+    if not_modified:
+        return not_modified
+    
+    task = await load_task(db, task_id, schema)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    if schema is TaskResponse:
+        return task
+    return render(task, schema, request, headers=response.headers)
 
-@app.post("/tasks", response_model=TaskResponse, status_code=201)
-async def create_task(task: TaskCreate, db: Session = Depends(get_db)):
-    """Create a new task"""
-    # Verify user exists
-    user = db.query(User).filter(User.id == task.assigned_to).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+@app.get("/sync", response_model=SyncResponse)
+async def sync_changes(since: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Get rows created, updated or deleted since a sync token
+    - since: token from a previous sync; omit for a full snapshot
+    Returns the changed tasks, notes and attachments, tombstones for deletions
+    (deleting a task or note implies its children), and the token for the next call.
+    """
+    since_time = decode_sync_token(since) if since else None
+    if since_time is not None and since_time < datetime.utcnow() - TOMBSTONE_RETENTION:
+        raise HTTPException(status_code=410, detail="Sync token expired; resync without `since`")
     
-    # Verify assigner exists if provided
-    if task.assigned_by:
-        assigner = db.query(User).filter(User.id == task.assigned_by).first()
-        if not assigner:
-            raise HTTPException(status_code=404, detail="Assigner user not found")
+    # The four reads below each see their own snapshot (READ COMMITTED on Postgres, one
+    # per statement on SQLite), so they're all capped at the newest stamp committed when
+    # this single statement ran. Writes are stamped in commit order, so anything committed
+    # after it is stamped later and left, whole, for the next sync.
+    stamp_columns = (Task.updated_at, Note.updated_at, Attachment.updated_at, Tombstone.deleted_at)
+    bounds = (await db.execute(select(*(select(func.max(column)).scalar_subquery() for column in stamp_columns)))).one()
+    latest = max(filter(None, [*bounds, since_time]), default=None)
     
-    db_task = Task(
+    async def changed(model, column):
+        stmt = select(model)
+        if latest is not None:
+            stmt = stmt.filter(or_(column <= latest, column.is_(None)))
+        if since_time is not None:
+            stmt = stmt.filter(column > since_time)
+        return (await db.execute(stmt.order_by(column))).scalars().all()
+    
+    tasks = await changed(Task, Task.updated_at)
+    notes = await changed(Note, Note.updated_at)
+    attachments = await changed(Attachment, Attachment.updated_at)
+    deleted = await changed(Tombstone, Tombstone.deleted_at)
+    
+    if since_time is None:
+        # A snapshot has nothing to delete on the client
+        deleted = []
+    else:
+        # SQLite can reuse the ID of a deleted row; skip tombstones a newer row supersedes
+        changed_rows = {"task": tasks, "note": notes, "attachment": attachments}
+        live = {(entity, row.id): row.updated_at for entity, rows in changed_rows.items() for row in rows}
+        deleted = [
+            tombstone for tombstone in deleted
+            if live.get((tombstone.entity, tombstone.entity_id), datetime.min) < tombstone.deleted_at
+        ]
+    
+    return {
+        "tasks": tasks,
+        "notes": notes,
+        "attachments": attachments,
+        "deleted": deleted,
+        "token": encode_cursor(latest.isoformat() if latest else None)
+    }
+
+@app.get("/events")
+async def stream_events(request: Request, user_id: Optional[int] = None, last_event_id: Optional[int] = None):
+    """
+    Server-sent event stream of task changes
+    - user_id: Only changes to tasks the user is assigned to or assigned
+    - last_event_id: Resume after this event (browsers also send the Last-Event-ID header on reconnect)
+    A `reset` event means the requested events are no longer buffered and the client should refetch.
+    """
+    header_id = request.headers.get("last-event-id")
+    if last_event_id is None and header_id and header_id.isdigit():
+        last_event_id = int(header_id)
+    
+    # Subscribe before replaying so nothing published in between is missed
+    queue = change_feed.subscribe()
+    return StreamingResponse(
+        stream_changes(request, queue, user_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/search", response_model=SearchResponse)
+async def search(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Full-text search over task titles, descriptions and notes, best match first.
+    Pass next_cursor back as cursor for the following page.
+    """
+    offset = decode_cursor(cursor) if cursor else 0
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    not_modified = await check_not_modified(db, request, response)
+    if not_modified:
+        return not_modified
+    
+    match = search_match(q)
+    if match is None:
+        return SearchResponse(hits=[])
+    
+    rows = (await db.execute(SEARCH_SQL, {"q": match, "limit": limit + 1, "offset": offset})).all()
+    hits = [
+        SearchHit(
+            kind=row.kind,
+            task_id=row.task_id,
+            note_id=row.entity_id if row.kind == "note" else None,
+            title=row.title or row.task_title or "",
+            snippet=row.snippet or "",
+            score=row.score
+        )
+        for row in rows[:limit]
+    ]
+    next_cursor = encode_cursor(offset + limit) if len(rows) > limit else None
+    return SearchResponse(hits=hits, next_cursor=next_cursor)
+
+@app.post("/tasks", response_model=TaskResponse, status_code=201)
+async def create_task(
+    task: TaskCreate,
+    request: Request,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_write_db)
+):
+    """Create a new task"""
+    schema = response_schema(request, fields, TaskResponse, TaskRecord)
+    await bump_version(db)
+    now = datetime.utcnow()
+    values = dict(
         title=task.title,
         description=task.description,
         assigned_to=task.assigned_to,
-        assigned_by=task.assigned_by,
-        status="Pending"
+        assigned_by=task.assigned_by or None,
+        status="Pending",
+        created_at=now,
+        updated_at=now,
+        last_activity_at=now
     )
-    db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
-    return db_task
+    # The users' foreign keys do the existence checks
+    try:
+        row = await insert_task_row(db, values)
+    except IntegrityError:
+        await db.rollback()
+        detail = "User not found" if await db.get(User, task.assigned_to) is None else "Assigner user not found"
+        raise HTTPException(status_code=404, detail=detail)
+    
+    await apply_stats(db, stats_delta(after=row))
+    await index_documents(db, [search_doc("task", row.id, row.id, row.title, row.description)])
+    await db.commit()
+    await publish_change("task.created", row.id, row.id, task_users(row))
+    return await task_response(db, request, row, schema, status_code=201)
+
+BULK_EVENT_TYPES = {"update": "task.updated", "complete": "task.completed", "reopen": "task.reopened"}
+
+@app.post("/tasks/bulk", response_model=BulkTaskResponse)
+async def bulk_tasks(batch: BulkTaskRequest, db: AsyncSession = Depends(get_write_db)):
+    """
+    Apply a batch of task operations in one transaction. Operations that fail
+    validation are reported in their result and skipped; the rest are applied
+    in order. Several operations on the same task collapse into one UPDATE.
+    """
+    operations = batch.operations
+    if len(operations) > MAX_BULK_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_OPERATIONS} operations per request")
+    
+    # Take the write lock first so the tasks read below can't change before commit
+    await bump_version(db)
+    
+    # One query each for every referenced user and task
+    user_ids = set()
+    task_ids = set()
+    for item in operations:
+        if item.op == "create" and item.task:
+            user_ids.update(filter(None, [item.task.assigned_to, item.task.assigned_by]))
+        elif item.task_id is not None:
+            task_ids.add(item.task_id)
+            if item.op == "update" and item.changes and item.changes.assigned_to is not None:
+                user_ids.add(item.changes.assigned_to)
+    known_users = set((await db.scalars(select(User.id).filter(User.id.in_(user_ids)))).all()) if user_ids else set()
+    stmt = select(*TASK_STATE_COLUMNS).filter(Task.id.in_(task_ids))
+    tasks = {row.id: row for row in (await db.execute(stmt)).all()} if task_ids else {}
+    
+    results = []
+    creates = []  # (result, values)
+    changes = {}  # task_id -> merged column values, in operation order
+    deleted = set()
+    events = []  # (result, event_type, users); published after commit
+    now = datetime.utcnow()
+    
+    for index, item in enumerate(operations):
+        result = BulkOperationResult(index=index, op=item.op, status=200, task_id=item.task_id)
+        results.append(result)
+    
+        if item.op == "create":
+            if item.task is None:
+                result.status, result.detail = 422, "Field 'task' is required for create"
+            elif item.task.assigned_to not in known_users:
+                result.status, result.detail = 404, "User not found"
+            elif item.task.assigned_by and item.task.assigned_by not in known_users:
+                result.status, result.detail = 404, "Assigner user not found"
+            else:
+                result.status = 201
+                values = {**item.task.model_dump(), "assigned_by": item.task.assigned_by or None, "status": "Pending", "created_at": now, "updated_at": now, "last_activity_at": now}
+                creates.append((result, values))
+                events.append((result, "task.created", [item.task.assigned_to, item.task.assigned_by]))
+            continue
+    
+        if item.task_id is None:
+            result.status, result.detail = 422, f"Field 'task_id' is required for {item.op}"
+            continue
+        if item.task_id not in tasks or item.task_id in deleted:
+            result.status, result.detail = 404, "Task not found"
+            continue
+        row = tasks[item.task_id]
+        users = [row.assigned_to, row.assigned_by]
+    
+        if item.op == "delete":
+            result.status = 204
+            deleted.add(item.task_id)
+            changes.pop(item.task_id, None)
+            events.append((result, "task.deleted", users))
+            continue
+    
+        if item.op == "update":
+            if item.changes is None:
+                result.status, result.detail = 422, "Field 'changes' is required for update"
+                continue
+            values = item.changes.model_dump(exclude_unset=True)
+            if "assigned_to" in values and values["assigned_to"] not in known_users:
+                result.status, result.detail = 404, "User not found"
+                continue
+            users = users + [values.get("assigned_to")]
+        elif item.op == "complete":
+            values = {"status": "Completed", "completed_at": now}
+        else:
+            values = {"status": "Pending", "completed_at": None}
+    
+        changes.setdefault(item.task_id, {}).update(values)
+        events.append((result, BULK_EVENT_TYPES[item.op], users))
+    
+    files, deleted_notes = [], []
+    if deleted:
+        # Bulk deletes skip ORM cascades, so remove notes and attachments explicitly
+        note_ids = select(Note.id).filter(Note.task_id.in_(deleted))
+        stmt = select(Attachment.sha256, Attachment.file_path).filter(Attachment.note_id.in_(note_ids))
+        files = (await db.execute(stmt)).all()
+        deleted_notes = (await db.scalars(note_ids)).all()
+    
+    delta = Counter()
+    for _, values in creates:
+        delta.update(stats_delta(after=SimpleNamespace(**values)))
+    for task_id, values in changes.items():
+        before = tasks[task_id]
+        delta.update(stats_delta(before, SimpleNamespace(**{**before._asdict(), **values})))
+    for task_id in deleted:
+        delta.update(stats_delta(before=tasks[task_id]))
+    
+    if creates:
+        stmt = insert(Task).returning(Task.id, sort_by_parameter_order=True)
+        new_ids = (await db.scalars(stmt, [values for _, values in creates])).all()
+        for (result, _), task_id in zip(creates, new_ids):
+            result.task_id = task_id
+        await index_documents(db, [
+            search_doc("task", result.task_id, result.task_id, values["title"], values["description"])
+            for result, values in creates
+        ])
+    if changes:
+        await db.execute(
+            update(Task),
+            [{"id": task_id, **values, "updated_at": now} for task_id, values in changes.items()]
+        )
+        renamed = [task_id for task_id, values in changes.items() if values.keys() & {"title", "description"}]
+        if renamed:
+            stmt = select(Task.id, Task.id.label("task_id"), Task.title, Task.description).filter(Task.id.in_(renamed))
+            await index_documents(db, [search_doc("task", *row) for row in (await db.execute(stmt)).all()])
+    if deleted:
+        await db.execute(delete(Attachment).filter(Attachment.note_id.in_(note_ids)))
+        await db.execute(delete(Note).filter(Note.task_id.in_(deleted)))
+        await db.execute(delete(Task).filter(Task.id.in_(deleted)))
+        await record_deletion(db, "task", *deleted)
+        await unindex_documents(db, "task", deleted)
+        await unindex_documents(db, "note", deleted_notes)
+    await apply_stats(db, delta)
+    await db.commit()
+    await release_files(db, files)
+    
+    if events:
+        await invalidate_responses(*(result.task_id for result, _, _ in events))
+    for result, event_type, users in events:
+        await publish_change(event_type, result.task_id, result.task_id, users, invalidate=False)
+    return BulkTaskResponse(results=results)
 
 @app.put("/tasks/{task_id}", response_model=TaskResponse)
-async def update_task(task_id: int, task_update: TaskUpdate, db: Session = Depends(get_db)):
+async def update_task(
+    task_id: int,
+    task_update: TaskUpdate,
+    request: Request,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_write_db)
+):
     """Update an existing task"""
-    db_task = db.query(Task).filter(Task.id == task_id).first()
-    if not db_task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
+    schema = response_schema(request, fields, TaskResponse, TaskRecord)
     # Update only provided fields
     update_data = task_update.dict(exclude_unset=True)
+    if "assigned_to" in update_data and update_data["assigned_to"] is None:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    if "assigned_to" in update_data:
-        user = db.query(User).filter(User.id == update_data["assigned_to"]).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+    await bump_version(db)
+    # Stats and the previous assignee's change event need the old state, but only these fields change it
+    before = None
+    if update_data.keys() & {"status", "assigned_to"}:
+        before = await task_state(db, task_id)
     
-    for field, value in update_data.items():
-        setattr(db_task, field, value)
+    try:
+        row = await update_task_row(db, task_id, update_data)
+    except IntegrityError:
+        raise HTTPException(status_code=404, detail="User not found")
+    if row is None:
+        raise HTTPException(status_code=404, detail="Task not found")
     
-    db.commit()
-    db.refresh(db_task)
-    return db_task
+    if before is not None:
+        await apply_stats(db, stats_delta(before, row))
+    if update_data.keys() & {"title", "description"}:
+        await index_documents(db, [search_doc("task", task_id, task_id, row.title, row.description)])
+    await db.commit()
+    previous_assignee = before.assigned_to if before is not None else None
+    await publish_change("task.updated", task_id, task_id, [previous_assignee, *task_users(row)])
+    return await task_response(db, request, row, schema)
 
 @app.delete("/tasks/{task_id}", status_code=204)
-async def delete_task(task_id: int, db: Session = Depends(get_db)):
+async def delete_task(task_id: int, db: AsyncSession = Depends(get_write_db)):
     """Delete a task"""
-    db_task = db.query(Task).filter(Task.id == task_id).first()
+    # Read the task under the version lock so the stats come off its committed state
+    await bump_version(db)
+    db_task = await db.get(Task, task_id)
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    db.delete(db_task)
-    db.commit()
+    # Attachments go with the task's notes; collect their files for cleanup
+    stmt = select(Attachment.sha256, Attachment.file_path).join(Note).filter(Note.task_id == task_id)
+    files = (await db.execute(stmt)).all()
+    note_ids = (await db.scalars(select(Note.id).filter(Note.task_id == task_id))).all()
+    
+    await db.delete(db_task)
+    await apply_stats(db, stats_delta(before=db_task))
+    await unindex_documents(db, "task", [task_id])
+    await unindex_documents(db, "note", note_ids)
+    await record_deletion(db, "task", task_id)
+    await db.commit()
+    await release_files(db, files)
+    await publish_change("task.deleted", task_id, task_id, task_users(db_task))
     return None
 
 @app.post("/tasks/{task_id}/complete", response_model=TaskResponse)
-async def complete_task(task_id: int, db: Session = Depends(get_db)):
+async def complete_task(task_id: int, request: Request, fields: Optional[str] = None, db: AsyncSession = Depends(get_write_db)):
     """Mark a task as completed"""
-    db_task = db.query(Task).filter(Task.id == task_id).first()
-    if not db_task:
+    schema = response_schema(request, fields, TaskResponse, TaskRecord)
+    await bump_version(db)
+    before = await task_state(db, task_id)
+    row = await update_task_row(db, task_id, {"status": "Completed", "completed_at": datetime.utcnow()})
+    if row is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    db_task.status = "Completed"
-    db_task.completed_at = datetime.utcnow()
-    
-    db.commit()
-    db.refresh(db_task)
-    return db_task
+    await apply_stats(db, stats_delta(before, row))
+    await db.commit()
+    await publish_change("task.completed", task_id, task_id, task_users(row))
+    return await task_response(db, request, row, schema)
 
 @app.post("/tasks/{task_id}/reopen", response_model=TaskResponse)
-async def reopen_task(task_id: int, db: Session = Depends(get_db)):
+async def reopen_task(task_id: int, request: Request, fields: Optional[str] = None, db: AsyncSession = Depends(get_write_db)):
     """Reopen a completed task"""
-    db_task = db.query(Task).filter(Task.id == task_id).first()
-    if not db_task:
+    schema = response_schema(request, fields, TaskResponse, TaskRecord)
+    await bump_version(db)
+    before = await task_state(db, task_id)
+    row = await update_task_row(db, task_id, {"status": "Pending", "completed_at": None})
+    if row is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    db_task.status = "Pending"
-    db_task.completed_at = None
-    
-    db.commit()
-    db.refresh(db_task)
-    return db_task
+    await apply_stats(db, stats_delta(before, row))
+    await db.commit()
+    await publish_change("task.reopened", task_id, task_id, task_users(row))
+    return await task_response(db, request, row, schema)
 
 @app.post("/tasks/{task_id}/notes", response_model=TaskResponse)
-async def add_note(task_id: int, note: NoteBase, db: Session = Depends(get_db)):
-    """Add a note to a task"""
-    db_task = db.query(Task).filter(Task.id == task_id).first()
-    if not db_task:
+async def add_note(
+    task_id: int,
+    note: NoteBase,
+    request: Request,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_write_db)
+):
+    """Add a note to a task; Prefer: return=minimal responds with just the new note"""
+    schema = response_schema(request, fields, TaskResponse, NoteRecord)
+    await bump_version(db)
+    now = datetime.utcnow()
+    row = await record_activity(db, task_id, notes=1, at=now)
+    if row is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    db_note = Note(task_id=task_id, content=note.content)
+    db_note = Note(task_id=task_id, content=note.content, created_at=now, updated_at=now)
     db.add(db_note)
-    db.commit()
-    db.refresh(db_task)
-    return db_task
+    await db.flush()
+    await index_documents(db, [search_doc("note", db_note.id, task_id, None, note.content)])
+    await db.commit()
+    await publish_change("note.created", task_id, db_note.id, task_users(row))
+    if prefers_minimal(request):
+        return render(db_note, schema, request)
+    return await task_response(db, request, row, schema)
 
 @app.put("/notes/{note_id}", response_model=NoteResponse)
-async def update_note(note_id: int, note_update: NoteBase, db: Session = Depends(get_db)):
+async def update_note(
+    note_id: int,
+    note_update: NoteBase,
+    request: Request,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_write_db)
+):
     """Update an existing note"""
-    db_note = db.query(Note).filter(Note.id == note_id).first()
+    schema = response_schema(request, fields, NoteResponse, NoteRecord)
+    db_note = await db.get(Note, note_id, options=[joinedload(Note.task)])
     if not db_note:
         raise HTTPException(status_code=404, detail="Note not found")
     
+    await bump_version(db)
     db_note.content = note_update.content
-    db.commit()
-    db.refresh(db_note)
-    return db_note
+    db_note.updated_at = datetime.utcnow()
+    await record_activity(db, db_note.task_id, at=db_note.updated_at)
+    await index_documents(db, [search_doc("note", note_id, db_note.task_id, None, note_update.content)])
+    await db.commit()
+    await publish_change("note.updated", db_note.task_id, note_id, task_users(db_note.task))
+    if has_relationships(schema):
+        stmt = select(Note).options(*eager_options(Note, schema)).filter(Note.id == note_id)
+        db_note = (await db.execute(stmt.execution_options(populate_existing=True))).scalar_one()
+    if schema is NoteResponse:
+        return db_note
+    return render(db_note, schema, request)
 
 @app.delete("/notes/{note_id}", status_code=204)
-async def delete_note(note_id: int, db: Session = Depends(get_db)):
+async def delete_note(note_id: int, db: AsyncSession = Depends(get_write_db)):
     """Delete a note"""
-    db_note = db.query(Note).filter(Note.id == note_id).first()
+    # Read the note under the version lock so the activity counts come off its committed attachments
+    await bump_version(db)
+    db_note = await db.get(Note, note_id, options=[selectinload(Note.attachments), joinedload(Note.task)])
     if not db_note:
         raise HTTPException(status_code=404, detail="Note not found")
     
-    # Delete associated files
-    for attachment in db_note.attachments:
-        try:
-            if os.path.exists(attachment.file_path):
-                os.remove(attachment.file_path)
-        except Exception as e:
-            print(f"Error deleting file: {e}")
+    files = [(attachment.sha256, attachment.file_path) for attachment in db_note.attachments]
     
-    db.delete(db_note)
-    db.commit()
+    # Delete the note, then any files no other attachment shares
+    await db.delete(db_note)
+    await record_activity(db, db_note.task_id, notes=-1, attachments=-len(files))
+    await unindex_documents(db, "note", [note_id])
+    await record_deletion(db, "note", note_id)
+    await db.commit()
+    await release_files(db, files)
+    await publish_change("note.deleted", db_note.task_id, note_id, task_users(db_note.task))
     return None
 
 @app.post("/notes/{note_id}/attachments")
-async def upload_attachment(
-    note_id: int,
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
+async def upload_attachment(note_id: int, file: UploadFile = File(...)):
     """Upload an attachment (PDF or image) to a note"""
-    # Verify note exists
-    db_note = db.query(Note).filter(Note.id == note_id).first()
-    if not db_note:
-        raise HTTPException(status_code=404, detail="Note not found")
-    
     # Validate file type
     allowed_types = ['application/pdf', 'image/jpeg', 'image/png', 'image/gif', 'image/webp']
     if file.content_type not in allowed_types:
@@ -524,87 +3097,149 @@ async def upload_attachment(
             detail="Only PDF and image files (JPEG, PNG, GIF, WebP) are allowed"
         )
     
-    # Validate file size (max 10MB)
-    max_file_size = 10 * 1024 * 1024
-    file_content = await file.read()
-    if len(file_content) > max_file_size:
-        raise HTTPException(status_code=400, detail="File size exceeds 10MB limit")
+    # Stream to disk off the event loop before queueing for the writer, so other writes
+    # don't wait on the copy; rejects as soon as the 10MB limit is passed
+    temp_path, file_size, sha256 = await run_in_threadpool(save_upload, file.file)
+    file_path = None
     
-    try:
-        # Create a unique filename
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        file_ext = file.filename.split('.')[-1] if '.' in file.filename else ''
-        unique_filename = f"{note_id}_{timestamp}_{file.filename}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
-        
-        # Save file
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-        
-        # Get file type
-        file_type = 'pdf' if file.content_type == 'application/pdf' else 'image'
-        
-        # Create attachment record
-        attachment = Attachment(
-            note_id=note_id,
-            filename=file.filename,
-            file_path=file_path,
-            file_type=file_type,
-            file_size=len(file_content)
-        )
-        db.add(attachment)
-        db.commit()
-        db.refresh(attachment)
+    async with write_session() as db:
+        # Verify note exists
+        db_note = await db.get(Note, note_id, options=[joinedload(Note.task)])
+        if not db_note:
+            os.remove(temp_path)
+            raise HTTPException(status_code=404, detail="Note not found")
         
-        return {
-            "id": attachment.id,
-            "note_id": attachment.note_id,
-            "filename": attachment.filename,
-            "file_type": attachment.file_type,
-            "file_size": attachment.file_size,
-            "created_at": attachment.created_at,
-            "download_url": f"/attachments/{attachment.id}/download"
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
+        try:
+            # Identical content shares one blob, whatever note it's attached to. Reusing it
+            # under the blobs lock keeps a concurrent release_files() from unlinking it first.
+            await lock_blobs(db)
+            file_path = await run_in_threadpool(store_blob, temp_path, sha256)
+            
+            # Get file type
+            file_type = 'pdf' if file.content_type == 'application/pdf' else 'image'
+            
+            # Create attachment record, stamped after the version row lock
+            await bump_version(db)
+            now = datetime.utcnow()
+            attachment = Attachment(
+                note_id=note_id,
+                filename=os.path.basename(file.filename),
+                file_path=file_path,
+                file_type=file_type,
+                file_size=file_size,
+                sha256=sha256,
+                created_at=now,
+                updated_at=now
+            )
+            db.add(attachment)
+            await record_activity(db, db_note.task_id, attachments=1, at=now)
+            await db.commit()
+            await publish_change("attachment.created", db_note.task_id, attachment.id, task_users(db_note.task))
+            
+            return {
+                "id": attachment.id,
+                "note_id": attachment.note_id,
+                "filename": attachment.filename,
+                "file_type": attachment.file_type,
+                "file_size": attachment.file_size,
+                "created_at": attachment.created_at,
+                "download_url": f"/attachments/{attachment.id}/download"
+            }
+        except Exception as e:
+            # Don't leave an unreferenced blob behind if the record couldn't be saved
+            await db.rollback()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if file_path:
+                await release_files(db, [(sha256, file_path)])
+            raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
 
 @app.get("/attachments/{attachment_id}/download")
-async def download_attachment(attachment_id: int, db: Session = Depends(get_db)):
-    """Download an attachment"""
-    from fastapi.responses import FileResponse
-    
-    attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
+async def download_attachment(attachment_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Download an attachment
+    Supports conditional GET (ETag / Last-Modified -> 304) and byte ranges.
+    """
+    attachment = await db.get(Attachment, attachment_id)
     if not attachment:
         raise HTTPException(status_code=404, detail="Attachment not found")
     
-    if not os.path.exists(attachment.file_path):
+    headers = attachment_headers(attachment)
+    if is_not_modified(request, headers["ETag"], headers["Last-Modified"]):
+        return Response(status_code=304, headers=headers)
+    
+    if not await run_in_threadpool(os.path.exists, attachment.file_path):
         raise HTTPException(status_code=404, detail="File not found on server")
     
-    return FileResponse(
+    return AttachmentFileResponse(
         path=attachment.file_path,
         filename=attachment.filename,
-        media_type='application/octet-stream'
+        media_type=attachment_media_type(attachment),
+        headers=headers
     )
 
 @app.delete("/attachments/{attachment_id}", status_code=204)
-async def delete_attachment(attachment_id: int, db: Session = Depends(get_db)):
+async def delete_attachment(attachment_id: int, db: AsyncSession = Depends(get_write_db)):
     """Delete an attachment"""
-    attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
+    attachment = await db.get(Attachment, attachment_id, options=[joinedload(Attachment.note).joinedload(Note.task)])
     if not attachment:
         raise HTTPException(status_code=404, detail="Attachment not found")
     
-    # Delete file from disk
-    try:
-        if os.path.exists(attachment.file_path):
-            os.remove(attachment.file_path)
-    except Exception as e:
-        print(f"Error deleting file: {e}")
+    files = [(attachment.sha256, attachment.file_path)]
     
-    # Delete database record
-    db.delete(attachment)
-    db.commit()
+    # Delete database record, then the file if no other attachment shares it
+    await db.delete(attachment)
+    await bump_version(db)
+    await record_activity(db, attachment.note.task_id, attachments=-1)
+    await record_deletion(db, "attachment", attachment_id)
+    await db.commit()
+    await release_files(db, files)
+    task = attachment.note.task
+    await publish_change("attachment.deleted", task.id, attachment_id, task_users(task))
     return None
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Task Tracker API")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="Run the API server (default)")
+    migrate_parser = commands.add_parser("migrate", help="Apply pending schema migrations")
+    migrate_parser.add_argument("--status", action="store_true", help="List migrations and whether each is applied")
+    commands.add_parser("explain", help="EXPLAIN the task queries and flag sequential scans and sorts")
+    commands.add_parser("repair-counters", help="Recompute the task note/attachment counters")
+    commands.add_parser("rebuild-stats", help="Rebuild the /stats summary table from the tasks table")
+    commands.add_parser("rebuild-search", help="Rebuild the full-text search index from tasks and notes")
+    args = parser.parse_args()
+    
+    if args.command == "migrate":
+        if args.status:
+            for version, description, applied in migration_status():
+                print(f"{'✅' if applied else '⏳'} {version}: {description}")
+        else:
+            print(f"✅ Applied {migrate()} migration(s); schema is at version {SCHEMA_VERSION}")
+        sys.exit(0)
+    
+    if args.command == "explain":
+        sys.exit(1 if explain_queries() else 0)
+    
+    if args.command == "repair-counters":
+        with engine.begin() as conn:
+            repaired = repair_counters(conn)
+        print(f"✅ Repaired counters on {repaired} task(s)")
+        sys.exit(0)
+    
+    if args.command == "rebuild-stats":
+        with engine.begin() as conn:
+            counted = rebuild_task_stats(conn)
+        print(f"✅ Rebuilt task stats from {counted} task(s)")
+        sys.exit(0)
+    
+    if args.command == "rebuild-search":
+        with engine.begin() as conn:
+            indexed = rebuild_search_index(conn)
+        print(f"✅ Indexed {indexed} document(s) for search")
+        sys.exit(0)
+    
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
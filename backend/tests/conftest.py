@@ -0,0 +1,69 @@
+"""
+main.py reads its configuration when imported, so point it at a throwaway SQLite
+database and upload directory first. Run from backend/: python -m pytest
+"""
+import contextlib
+import os
+import sys
+import tempfile
+
+import pytest
+
+WORK_DIR = tempfile.mkdtemp(prefix="task-tracker-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DIR}/tasks.db"
+# Cached responses would hide what repeated requests cost
+os.environ["CACHE_BACKEND"] = "off"
+os.environ["SLOW_REQUEST_MS"] = "0"
+os.chdir(WORK_DIR)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event, text  # noqa: E402
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+def clear_tasks():
+    """Delete every task, note and attachment along with the tables derived from them"""
+    with main.engine.begin() as conn:
+        for table in ("attachments", "notes", "tasks", "task_stats", "search_documents", "tombstones"):
+            conn.execute(text(f"DELETE FROM {table}"))
+
+@pytest.fixture
+def empty_tasks(client):
+    """Start from a database with the seeded users and no tasks"""
+    clear_tasks()
+
+@pytest.fixture
+def count_statements():
+    """Context manager collecting the SQL statements run on any engine while it's open"""
+    @contextlib.contextmanager
+    def counting():
+        statements = []
+        
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        
+        engines = {main.engine, main.async_engine.sync_engine, main.async_read_engine.sync_engine}
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            for engine in engines:
+                event.remove(engine, "before_cursor_execute", record)
+    return counting
+
+def create_task(client, notes: int = 0, attachments_per_note: int = 0, **fields) -> int:
+    """Create a task through the API with notes and PDF attachments; returns its id"""
+    body = {"title": "Task", "description": "Description", "assigned_to": 1, "assigned_by": 2, **fields}
+    task_id = client.post("/tasks", json=body, headers={"Prefer": "return=minimal"}).json()["id"]
+    for i in range(notes):
+        note_id = client.post(f"/tasks/{task_id}/notes", json={"content": f"Note {i}"}, headers={"Prefer": "return=minimal"}).json()["id"]
+        for j in range(attachments_per_note):
+            content = f"%PDF-1.4 {task_id}-{note_id}-{j}".encode()
+            client.post(f"/notes/{note_id}/attachments", files={"file": ("file.pdf", content, "application/pdf")})
+    return task_id
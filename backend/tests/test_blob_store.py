@@ -0,0 +1,40 @@
+"""Attachments share content-addressed blobs, removed with the last attachment that references them"""
+import hashlib
+import os
+
+import main
+from conftest import create_task
+
+def upload(client, note_id: int, content: bytes) -> dict:
+    response = client.post(f"/notes/{note_id}/attachments", files={"file": ("shared.pdf", content, "application/pdf")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def blob_for(content: bytes) -> str:
+    return main.blob_path(hashlib.sha256(content).hexdigest())
+
+def note_ids(client, task_id: int) -> list:
+    return [note["id"] for note in client.get(f"/tasks/{task_id}").json()["notes"]]
+
+def test_shared_blob_outlives_all_but_the_last_reference(client, empty_tasks):
+    content = b"%PDF-1.4 shared between notes"
+    first_note, second_note = note_ids(client, create_task(client, notes=2))
+    first = upload(client, first_note, content)
+    upload(client, second_note, content)
+    assert os.path.exists(blob_for(content))
+    
+    assert client.delete(f"/attachments/{first['id']}").status_code == 204
+    assert os.path.exists(blob_for(content))
+    
+    assert client.delete(f"/notes/{second_note}").status_code == 204
+    assert not os.path.exists(blob_for(content))
+
+def test_reupload_after_release_restores_the_blob(client, empty_tasks):
+    content = b"%PDF-1.4 uploaded again after delete"
+    task_id = create_task(client, notes=1)
+    (note_id,) = note_ids(client, task_id)
+    assert client.delete(f"/attachments/{upload(client, note_id, content)['id']}").status_code == 204
+    assert not os.path.exists(blob_for(content))
+    
+    attachment = upload(client, note_id, content)
+    assert client.get(attachment["download_url"]).content == content
@@ -0,0 +1,14 @@
+"""POST /tasks/bulk treats its input like the single-task endpoints do"""
+
+def test_create_with_assigned_by_zero_is_unassigned(client, empty_tasks):
+    task = {"title": "From bulk", "description": "No assigner", "assigned_to": 1, "assigned_by": 0}
+    single = client.post("/tasks", json=task)
+    assert single.status_code == 201, single.text
+    
+    response = client.post("/tasks/bulk", json={"operations": [{"op": "create", "task": task}]})
+    assert response.status_code == 200, response.text
+    (result,) = response.json()["results"]
+    assert result["status"] == 201
+    created = client.get(f"/tasks/{result['task_id']}").json()
+    assert created["assigned_by"] is None
+    assert created["assigned_by"] == single.json()["assigned_by"]
@@ -0,0 +1,14 @@
+"""Change events name the client whose write caused them"""
+import main
+from conftest import create_task
+
+def test_change_carries_the_writers_client_id(client, empty_tasks):
+    task_id = create_task(client)
+    response = client.post(f"/tasks/{task_id}/notes", json={"content": "Mine"}, headers={"X-Client-Id": "tab-1"})
+    assert response.status_code == 200, response.text
+    assert main.change_feed.recent[-1]["type"] == "note.created"
+    assert main.change_feed.recent[-1]["client_id"] == "tab-1"
+    
+    client.put(f"/tasks/{task_id}", json={"title": "Renamed"})
+    assert main.change_feed.recent[-1]["type"] == "task.updated"
+    assert "client_id" not in main.change_feed.recent[-1]
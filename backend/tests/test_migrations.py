@@ -0,0 +1,26 @@
+"""Migration steps bring databases made by older versions up to the current schema"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+import main
+from conftest import WORK_DIR
+
+def test_assigned_by_without_foreign_key_is_enforced():
+    engine = create_engine(f"sqlite:///{WORK_DIR}/legacy.db")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY)"))
+        # assigned_by as the old ensure_schema added it, without REFERENCES
+        conn.execute(text("CREATE TABLE tasks (id INTEGER PRIMARY KEY, assigned_by INTEGER)"))
+        conn.execute(text("INSERT INTO users (id) VALUES (1)"))
+        conn.execute(text("INSERT INTO tasks (id, assigned_by) VALUES (1, 99)"))
+        main._enforce_assigned_by_foreign_key(conn)
+    
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO tasks (id, assigned_by) VALUES (2, 1)"))
+        conn.execute(text("INSERT INTO tasks (id, assigned_by) VALUES (3, NULL)"))
+    with pytest.raises(IntegrityError), engine.begin() as conn:
+        conn.execute(text("INSERT INTO tasks (id, assigned_by) VALUES (4, 99)"))
+    with pytest.raises(IntegrityError), engine.begin() as conn:
+        conn.execute(text("UPDATE tasks SET assigned_by = 99 WHERE id = 2"))
+    engine.dispose()
@@ -0,0 +1,32 @@
+"""Task reads load relationships in a fixed number of statements, however many rows there are"""
+import pytest
+
+from conftest import create_task
+
+def statements_for(client, count_statements, url: str) -> int:
+    with count_statements() as statements:
+        response = client.get(url)
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+@pytest.mark.parametrize("url", [
+    "/tasks",
+    "/tasks?expand=notes",
+    "/tasks/my-view?user_id=1",
+    "/tasks/my-view?user_id=1&compact=true",
+])
+def test_task_lists_do_not_query_per_row(client, empty_tasks, count_statements, url):
+    create_task(client, notes=1, attachments_per_note=1)
+    one_task = statements_for(client, count_statements, url)
+    
+    for i in range(9):
+        create_task(client, notes=3, attachments_per_note=2, assigned_to=1 + i % 2, assigned_by=2 - i % 2)
+    many_tasks = statements_for(client, count_statements, url)
+    
+    assert many_tasks == one_task
+
+def test_task_detail_does_not_query_per_note(client, empty_tasks, count_statements):
+    bare_task = create_task(client, notes=1, attachments_per_note=1)
+    busy_task = create_task(client, notes=8, attachments_per_note=3)
+    
+    assert statements_for(client, count_statements, f"/tasks/{busy_task}") == statements_for(client, count_statements, f"/tasks/{bare_task}")
@@ -0,0 +1,68 @@
+"""GET /search on the SQLite FTS5 index: ranking, highlighting, paging and hostile input"""
+import pytest
+
+from conftest import create_task
+
+def search(client, q: str, **params) -> dict:
+    response = client.get("/search", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_title_matches_rank_above_description_and_note_matches(client, empty_tasks):
+    in_note = create_task(client, title="Quarterly planning", description="Agenda")
+    client.post(f"/tasks/{in_note}/notes", json={"content": "Draft the zeppelin budget"})
+    in_description = create_task(client, title="Hangar lease", description="Park the zeppelin somewhere dry")
+    in_title = create_task(client, title="Zeppelin maintenance", description="Inspect the envelope")
+    
+    hits = search(client, "zeppelin")["hits"]
+    assert [hit["task_id"] for hit in hits][0] == in_title
+    assert {hit["task_id"] for hit in hits} == {in_title, in_description, in_note}
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+    note_hit = next(hit for hit in hits if hit["task_id"] == in_note)
+    assert note_hit["kind"] == "note" and note_hit["note_id"] is not None
+
+def test_matches_are_wrapped_in_mark(client, empty_tasks):
+    task_id = create_task(client, title="Calibrate the spectrometer", description="The spectrometer drifts overnight")
+    (hit,) = search(client, "spectrometer")["hits"]
+    assert hit["task_id"] == task_id
+    assert hit["title"] == "Calibrate the <mark>spectrometer</mark>"
+    assert "<mark>spectrometer</mark> drifts" in hit["snippet"]
+
+def test_last_word_matches_as_a_prefix(client, empty_tasks):
+    task_id = create_task(client, title="Refactor the tokenizer")
+    assert [hit["task_id"] for hit in search(client, "refactor token")["hits"]] == [task_id]
+
+def test_cursor_pages_through_every_hit_once(client, empty_tasks):
+    task_ids = {create_task(client, title=f"Lighthouse inspection {i}") for i in range(7)}
+    seen = []
+    page = search(client, "lighthouse", limit=3)
+    pages = 1
+    while page["next_cursor"]:
+        seen += [hit["task_id"] for hit in page["hits"]]
+        page = search(client, "lighthouse", limit=3, cursor=page["next_cursor"])
+        pages += 1
+    seen += [hit["task_id"] for hit in page["hits"]]
+    assert pages == 3
+    assert sorted(seen) == sorted(task_ids)
+
+def test_invalid_cursor_is_rejected(client, empty_tasks):
+    assert client.get("/search", params={"q": "anything", "cursor": "not-a-cursor"}).status_code == 400
+
+@pytest.mark.parametrize("q", ['AND OR "(', '"', "(", ")", "*", "NEAR(", "title:", "^", "-", "'; DROP TABLE tasks; --"])
+def test_operator_laden_input_is_treated_as_text(client, empty_tasks, q):
+    create_task(client, title="Ordinary task")
+    assert isinstance(search(client, q)["hits"], list)
+
+def test_operators_match_as_words(client, empty_tasks):
+    task_id = create_task(client, title="Salt AND pepper OR vinegar")
+    create_task(client, title="Salt only")
+    assert [hit["task_id"] for hit in search(client, 'salt AND OR "(')["hits"]] == [task_id]
+
+def test_index_follows_task_and_note_writes(client, empty_tasks):
+    task_id = create_task(client, title="Migrate the aquarium")
+    client.put(f"/tasks/{task_id}", json={"title": "Migrate the terrarium"})
+    assert search(client, "aquarium")["hits"] == []
+    assert [hit["task_id"] for hit in search(client, "terrarium")["hits"]] == [task_id]
+    
+    client.delete(f"/tasks/{task_id}")
+    assert search(client, "terrarium")["hits"] == []
@@ -0,0 +1,74 @@
+"""JSON_SERIALIZER=orjson produces byte-identical responses to the Pydantic path"""
+import pytest
+
+import main
+from conftest import clear_tasks, create_task
+
+URLS = [
+    "/tasks",
+    "/tasks?status=Pending",
+    "/tasks?assigned_to=1",
+    "/tasks?limit=3",
+    "/tasks?expand=",
+    "/tasks?expand=notes",
+    "/tasks?expand=attachments",
+    "/tasks?fields=title,notes",
+    "/tasks?fields=assigner,status&expand=notes",
+    "/tasks?fields=id",
+    "/tasks?limit=2&fields=title,assigned_user",
+    "/tasks/my-view?user_id=1",
+    "/tasks/my-view?user_id=2&compact=true",
+    "/tasks/my-view?user_id=1&compact=true&expand=",
+    "/tasks/my-view?user_id=1&limit=2",
+    "/tasks/my-view?user_id=1&limit=2&compact=true&fields=title",
+    "/tasks/my-view?user_id=1&expand=notes&fields=notes,note_count",
+    "/tasks/my-view?user_id=9",
+    "/tasks?fields=bogus",
+    "/tasks?expand=bogus",
+    "/tasks?cursor=not-a-cursor",
+]
+
+# Pages after the first, following X-Next-Cursor (/tasks) or next_cursor (/tasks/my-view)
+PAGED_URLS = ["/tasks?limit=3", "/tasks?limit=2&fields=title&expand=", "/tasks/my-view?user_id=1&limit=2"]
+
+def next_cursor(response):
+    if "x-next-cursor" in response.headers:
+        return response.headers["x-next-cursor"]
+    return response.json().get("next_cursor")
+
+@pytest.fixture(scope="module")
+def tasks(client):
+    clear_tasks()
+    for i in range(12):
+        task_id = create_task(
+            client,
+            notes=i % 4,
+            attachments_per_note=i % 2,
+            title=f"Task {i} ünïcödé \"quoted\"",
+            description="Line one\nline two 😀" if i % 3 else "",
+            assigned_to=1 + i % 2,
+            assigned_by=None if i % 5 == 0 else 2 - i % 2
+        )
+        if i % 3 == 0:
+            client.post(f"/tasks/{task_id}/complete")
+
+def fetch(client, url: str, fast_json: bool, monkeypatch):
+    monkeypatch.setattr(main, "FAST_JSON", fast_json)
+    response = client.get(url)
+    headers = {name: value for name, value in response.headers.items() if name != "server-timing"}
+    return response.status_code, headers, response.content
+
+@pytest.mark.parametrize("url", URLS)
+def test_orjson_matches_pydantic(client, tasks, monkeypatch, url):
+    assert fetch(client, url, True, monkeypatch) == fetch(client, url, False, monkeypatch)
+
+@pytest.mark.parametrize("url", PAGED_URLS)
+def test_orjson_matches_pydantic_on_later_pages(client, tasks, monkeypatch, url):
+    cursor = next_cursor(client.get(url))
+    assert cursor is not None
+    for _ in range(2):
+        page_url = f"{url}&cursor={cursor}"
+        assert fetch(client, page_url, True, monkeypatch) == fetch(client, page_url, False, monkeypatch)
+        cursor = next_cursor(client.get(page_url))
+        if cursor is None:
+            break
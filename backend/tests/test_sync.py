@@ -0,0 +1,53 @@
+"""GET /sync tokens never move past a change the response left out"""
+from datetime import datetime
+
+from sqlalchemy import delete, event, insert, update
+
+import main
+from conftest import create_task
+
+def sync(client, since=None) -> dict:
+    response = client.get("/sync", params={"since": since} if since else {})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_sync_returns_changes_once(client, empty_tasks):
+    task_id = create_task(client, notes=1)
+    snapshot = sync(client)
+    assert task_id in [task["id"] for task in snapshot["tasks"]]
+    
+    assert sync(client, snapshot["token"])["tasks"] == []
+    client.put(f"/tasks/{task_id}", json={"title": "Renamed"})
+    changes = sync(client, snapshot["token"])
+    assert [task["title"] for task in changes["tasks"]] == ["Renamed"]
+
+def test_write_committed_between_reads_is_not_skipped(client, empty_tasks):
+    task_id = create_task(client, notes=1)
+    note_id = client.get(f"/tasks/{task_id}").json()["notes"][0]["id"]
+    token = sync(client)["token"]
+    
+    # Commit what delete_note does (task stamped, then its tombstone) after /sync has
+    # read the tasks table but before it reads the tombstones
+    written = []
+    
+    def delete_note_midway(conn, cursor, statement, parameters, context, executemany):
+        if written or not statement.lstrip().startswith("SELECT notes."):
+            return
+        written.append(True)
+        with main.engine.begin() as writer:
+            writer.execute(update(main.Task).filter(main.Task.id == task_id).values(updated_at=datetime.utcnow()))
+            writer.execute(delete(main.Note).filter(main.Note.id == note_id))
+            writer.execute(insert(main.Tombstone).values(entity="note", entity_id=note_id, deleted_at=datetime.utcnow()))
+    
+    event.listen(main.async_read_engine.sync_engine, "before_cursor_execute", delete_note_midway)
+    try:
+        during = sync(client, token)
+    finally:
+        event.remove(main.async_read_engine.sync_engine, "before_cursor_execute", delete_note_midway)
+    assert written
+    after = sync(client, during["token"])
+    
+    tasks = [task["id"] for task in during["tasks"] + after["tasks"]]
+    deleted = [(tombstone["entity"], tombstone["entity_id"]) for tombstone in during["deleted"] + after["deleted"]]
+    assert task_id in tasks
+    assert ("note", note_id) in deleted
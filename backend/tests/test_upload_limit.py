@@ -0,0 +1,77 @@
+"""Oversized attachment uploads are turned away before their body is read"""
+import main
+from conftest import create_task
+
+BOUNDARY = "upload-limit-test"
+
+def task_with_note(client):
+    task_id = create_task(client, notes=1)
+    return task_id, client.get(f"/tasks/{task_id}").json()["notes"][0]["id"]
+
+def attachments(client, task_id: int) -> list:
+    return client.get(f"/tasks/{task_id}").json()["notes"][0]["attachments"]
+
+def multipart(size: int) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.pdf\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n".encode()
+        + b"%" * size
+        + f"\r\n--{BOUNDARY}--\r\n".encode()
+    )
+
+def post_chunks(client, path: str, body: bytes, content_length: bool):
+    """POST `body` to the app in UPLOAD_CHUNK_SIZE messages; returns (status, messages the app read)"""
+    chunks = [body[start:start + main.UPLOAD_CHUNK_SIZE] for start in range(0, len(body), main.UPLOAD_CHUNK_SIZE)]
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": headers, "client": ("testclient", 50000), "server": ("testserver", 80)
+    }
+    read = 0
+    status = None
+    
+    async def receive():
+        nonlocal read
+        if read == len(chunks):
+            return {"type": "http.disconnect"}
+        read += 1
+        return {"type": "http.request", "body": chunks[read - 1], "more_body": read < len(chunks)}
+    
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+    
+    async def request():
+        await main.app(scope, receive, send)
+    
+    # On the test client's event loop, where the app's engines and locks live
+    client.portal.call(request)
+    return status, read
+
+def test_declared_oversized_upload_is_rejected_unread(client, empty_tasks):
+    task_id, note_id = task_with_note(client)
+    status, read = post_chunks(client, f"/notes/{note_id}/attachments", multipart(main.MAX_UPLOAD_REQUEST_SIZE), content_length=True)
+    assert status == 413
+    assert read == 0
+    assert attachments(client, task_id) == []
+
+def test_undeclared_oversized_upload_is_cut_off(client, empty_tasks):
+    task_id, note_id = task_with_note(client)
+    body = multipart(main.MAX_UPLOAD_REQUEST_SIZE + 5 * main.UPLOAD_CHUNK_SIZE)
+    status, read = post_chunks(client, f"/notes/{note_id}/attachments", body, content_length=False)
+    assert status == 413
+    assert read * main.UPLOAD_CHUNK_SIZE <= main.MAX_UPLOAD_REQUEST_SIZE + main.UPLOAD_CHUNK_SIZE
+    assert attachments(client, task_id) == []
+
+def test_upload_at_the_limit_is_accepted(client, empty_tasks):
+    task_id, note_id = task_with_note(client)
+    response = client.post(f"/notes/{note_id}/attachments", content=multipart(main.MAX_UPLOAD_SIZE), headers={
+        "Content-Type": f"multipart/form-data; boundary={BOUNDARY}"
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["file_size"] == main.MAX_UPLOAD_SIZE
+    assert len(attachments(client, task_id)) == 1
@@ -54,6 +54,12 @@ function App() {
     }
   }, [currentUser, filters]);
 
+  // Refresh when tasks change elsewhere, e.g. edits made by the other user
+  useEffect(() => {
+    if (!currentUser) return undefined;
+    return apiService.subscribeToChanges(currentUser.id, () => fetchTasks());
+  }, [currentUser, filters]);
+
   // Update displayed tasks when tab changes
   useEffect(() => {
     const currentTabTasks = tasksByView[activeTab] || [];
@@ -109,6 +115,21 @@ function App() {
     }
   };
 
+  /**
+   * Copy a task's fresh counters onto its card without refetching every view
+   */
+  const updateTaskCounts = (freshTask) => {
+    const { note_count, attachment_count, last_activity_at } = freshTask;
+    setTasksByView((views) => Object.fromEntries(
+      Object.entries(views).map(([view, viewTasks]) => [
+        view,
+        viewTasks.map((task) => (
+          task.id === freshTask.id ? { ...task, note_count, attachment_count, last_activity_at } : task
+        )),
+      ])
+    ));
+  };
+
   /**
    * Handle user login/switch
    */
@@ -249,7 +270,7 @@ function App() {
       const updatedTask = await apiService.addNote(taskId, content);
       setSelectedTask(updatedTask);
       toast.success('Note added!');
-      fetchTasks(); // Refresh to update note count
+      updateTaskCounts(updatedTask);
     } catch (error) {
       toast.error('Failed to add note');
       console.error('Error adding note:', error);
@@ -266,7 +287,7 @@ function App() {
       const freshTask = await apiService.getTask(selectedTask.id);
       setSelectedTask(freshTask);
       toast.success('Note updated!');
-      fetchTasks();
+      updateTaskCounts(freshTask);
     } catch (error) {
       toast.error('Failed to update note');
       console.error('Error updating note:', error);
@@ -284,7 +305,7 @@ function App() {
         const freshTask = await apiService.getTask(selectedTask.id);
         setSelectedTask(freshTask);
         toast.success('Note deleted!');
-        fetchTasks();
+        updateTaskCounts(freshTask);
       } catch (error) {
         toast.error('Failed to delete note');
         console.error('Error deleting note:', error);
@@ -299,7 +320,7 @@ function App() {
     try {
       const freshTask = await apiService.getTask(selectedTask.id);
       setSelectedTask(freshTask);
-      fetchTasks();
+      updateTaskCounts(freshTask);
     } catch (error) {
       console.error('Error refreshing task:', error);
     }
@@ -64,10 +64,10 @@ const TaskCard = ({ task, onEdit, onDelete, onToggleComplete, onViewNotes }) =>
           <Clock className="w-4 h-4 flex-shrink-0" />
           <span className="truncate">{formatDate(task.created_at)}</span>
         </div>
-        {task.notes && task.notes.length > 0 && (
+        {task.note_count > 0 && (
           <div className="flex items-center gap-1">
             <MessageSquare className="w-4 h-4 flex-shrink-0" />
-            <span>{task.notes.length}</span>
+            <span>{task.note_count}</span>
           </div>
         )}
       </div>
@@ -88,7 +88,7 @@ const TaskCard = ({ task, onEdit, onDelete, onToggleComplete, onViewNotes }) =>
         >
           <MessageSquare className="w-4 h-4" />
           <span className="hidden sm:inline">Notes</span>
-          <span className="text-xs">({task.notes?.length || 0})</span>
+          <span className="text-xs">({task.note_count || 0})</span>
         </button>
         <button
           onClick={() => onEdit(task)}
@@ -3,11 +3,15 @@ import axios from 'axios';
 // Base API URL - can be configured via environment variable
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
+// Identifies this tab's writes, so the change feed can skip the events they cause
+const CLIENT_ID = window.crypto?.randomUUID?.() ?? `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
 // Create axios instance with default config
 const api = axios.create({
   baseURL: API_BASE_URL,
   headers: {
     'Content-Type': 'application/json',
+    'X-Client-Id': CLIENT_ID,
   },
 });
 
@@ -32,10 +36,16 @@ const apiService = {
   getMyTasksView: async (userId, filters = {}) => {
     const params = new URLSearchParams();
     params.append('user_id', userId);
+    params.append('compact', 'true');
+    params.append('expand', ''); // Cards only need the note counts, not the notes
     if (filters.status) params.append('status', filters.status);
     
+    // Compact mode sends each task once; expand the ID lists back into task arrays
     const response = await api.get(`/tasks/my-view?${params.toString()}`);
-    return response.data;
+    const { tasks, next_cursor: _nextCursor, ...views } = response.data;
+    return Object.fromEntries(
+      Object.entries(views).map(([view, ids]) => [view, ids.map((id) => tasks[id])])
+    );
   },
 
   getTask: async (taskId) => {
@@ -93,6 +103,7 @@ const apiService = {
       {
         headers: {
           'Content-Type': 'multipart/form-data',
+          'X-Client-Id': CLIENT_ID,
         },
       }
     );
@@ -103,6 +114,26 @@ const apiService = {
     await api.delete(`/attachments/${attachmentId}`);
   },
 
+  // Change feed: calls onChange (at most every 300ms) when tasks the user is
+  // involved in change elsewhere. This tab's own writes are skipped, since the
+  // code making them already updates the UI. Returns a function that closes the stream.
+  subscribeToChanges: (userId, onChange) => {
+    const source = new EventSource(`${API_BASE_URL}/events?user_id=${userId}`);
+    let timer = null;
+    source.onmessage = (event) => {
+      if (JSON.parse(event.data).client_id === CLIENT_ID) return;
+      if (timer) return;
+      timer = setTimeout(() => {
+        timer = null;
+        onChange();
+      }, 300);
+    };
+    return () => {
+      clearTimeout(timer);
+      source.close();
+    };
+  },
+
   downloadAttachment: async (attachmentId, filename) => {
     const response = await axios.get(
       `${API_BASE_URL}/attachments/${attachmentId}/download`,